@@ -5,14 +5,56 @@ Makes backgrounds transparent by removing white/light backgrounds
 """
 
 import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
 from PIL import Image
 import numpy as np
+from batch_processing import process_files, logo_sources, DEFAULT_WORKERS
+from derivative_store import apply_stored, STORE_DIRNAME
+
+def clear_background_alpha(data, threshold=240):
+    """
+    Make light background pixels transparent in an RGBA uint8 array, in place
+    
+    The original test (all RGB >= threshold, or mean RGB >= threshold)
+    reduces to one integer comparison: all channels >= threshold implies the
+    mean is too, and mean >= threshold is exactly R + G + B >= 3 * threshold.
+    Working memory is a uint16 sum and a boolean mask; no float planes.
+    """
+    total = data[:, :, 0].astype(np.uint16)
+    total += data[:, :, 1]
+    total += data[:, :, 2]
+    background_mask = total >= 3 * threshold
+    np.copyto(data[:, :, 3], 0, where=background_mask)
+    return data
 
 def remove_background(image_path, output_path, threshold=240):
     """
     Remove white/light backgrounds from logos
     threshold: RGB values above this will be made transparent (default 240 = very light colors)
     """
+    with Image.open(image_path) as img:
+        # Convert to RGBA if not already
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        
+        # One writable buffer; alpha is cleared in place
+        data = np.array(img)
+    
+    clear_background_alpha(data, threshold)
+    
+    # fromarray maps the RGBA buffer rather than copying it
+    Image.fromarray(data, 'RGBA').save(output_path, 'PNG')
+
+def remove_background_float(image_path, output_path, threshold=240):
+    """
+    Original float-mean implementation of remove_background, kept as the
+    reference for benchmark_remove_background
+    """
     with Image.open(image_path) as img:
         # Convert to RGBA if not already
         if img.mode != 'RGBA':
@@ -48,43 +90,106 @@ def remove_background(image_path, output_path, threshold=240):
         transparent_img = Image.fromarray(new_data, 'RGBA')
         transparent_img.save(output_path, 'PNG')
 
-def process_logos_for_transparency(input_dir, threshold=240):
-    """Process all PNG files to remove backgrounds"""
+def benchmark_remove_background(directory="logos", threshold=240):
+    """
+    Compare remove_background against the float reference on every PNG in a
+    directory: outputs must match; reports time and peak memory per version
+    
+    Files are written to a temporary folder, never over the originals.
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(directory, "*.png")) if os.path.isfile(p))
+    if not paths:
+        print(f"No PNG files in {directory}")
+        return
     
-    processed_count = 0
+    out_dir = tempfile.mkdtemp(prefix="bg-bench-")
+    versions = [("float", remove_background_float), ("integer", remove_background)]
+    stats = {name: {"seconds": 0.0, "peak": 0} for name, _ in versions}
+    megapixels = 0.0
+    mismatches = []
     
-    # Process each PNG file in the main directory (not subfolders)
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.png') and not filename.endswith('-black.png') and not filename.endswith('-white.png'):
-            input_path = os.path.join(input_dir, filename)
+    try:
+        for path in paths:
+            with Image.open(path) as img:
+                megapixels += img.width * img.height / 1e6
             
-            # Skip if it's a directory
-            if os.path.isdir(input_path):
-                continue
-                
-            # Create output path (overwrite original)
-            output_path = input_path
+            outputs = {}
+            for name, func in versions:
+                out_path = os.path.join(out_dir, f"{name}-{os.path.basename(path)}")
+                tracemalloc.start()
+                start = time.perf_counter()
+                func(path, out_path, threshold)
+                stats[name]["seconds"] += time.perf_counter() - start
+                stats[name]["peak"] = max(stats[name]["peak"], tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                with Image.open(out_path) as result:
+                    outputs[name] = np.array(result)
             
-            try:
-                remove_background(input_path, output_path, threshold)
-                print(f"Processed: {filename}")
-                processed_count += 1
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+            if not np.array_equal(outputs["float"], outputs["integer"]):
+                mismatches.append(os.path.basename(path))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
     
-    return processed_count
+    print(f"Benchmarked {len(paths)} images ({megapixels:.1f} MP) from {directory}, threshold {threshold}")
+    for name, _ in versions:
+        s = stats[name]
+        print(f"  {name:8s} {s['seconds']:6.2f}s  {megapixels / s['seconds']:6.1f} MP/s  "
+              f"peak {s['peak'] / 2**20:6.1f} MiB")
+    if mismatches:
+        print(f"❌ Outputs differ for: {', '.join(mismatches)}")
+    else:
+        print("✅ Outputs identical")
+
+def process_logos_for_transparency(input_dir, threshold=240, workers=1, output_dir=None, store_dir=None):
+    """
+    Process all PNG files to remove backgrounds (in place, or into output_dir)
+    
+    With workers > 1 files are processed in parallel. With store_dir, results
+    go through a DerivativeStore: unchanged inputs are skipped, and files
+    already processed are traced back to their originals. Returns a
+    BatchReport with per-file timings and any failures.
+    """
+    paths = logo_sources(input_dir)
+    if store_dir:
+        return process_files(apply_stored, paths, workers, output_dir=output_dir,
+                             operation=remove_background, store_dir=store_dir, threshold=threshold)
+    return process_files(remove_background, paths, workers, output_dir=output_dir,
+                         threshold=threshold)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make light logo backgrounds transparent")
+    parser.add_argument("directory", nargs="?",
+                        help="Folder of logos to update in place (default: ~/Downloads/granalytic-logos)")
+    parser.add_argument("--threshold", type=int, default=240,
+                        help="Pixels whose mean RGB is at least this become transparent")
+    parser.add_argument("--output", help="Write results here instead of over the originals")
+    parser.add_argument("--no-store", action="store_true",
+                        help=f"Skip the derivative store (DIRECTORY/{STORE_DIRNAME}) and always reprocess")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare against the float reference on logos/ (or DIRECTORY) without modifying it")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Files processed in parallel (default: {DEFAULT_WORKERS}, one per core)")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        benchmark_remove_background(args.directory or "logos", args.threshold)
+        raise SystemExit
+    
     # Set paths
-    input_directory = os.path.expanduser("~/Downloads/granalytic-logos")
+    input_directory = args.directory or os.path.expanduser("~/Downloads/granalytic-logos")
     
     print("Removing backgrounds from colored logos...")
     print(f"Processing directory: {input_directory}")
-    print("Threshold: 240 (pixels with RGB values >= 240 will be made transparent)")
+    print(f"Threshold: {args.threshold} (pixels with RGB values >= {args.threshold} will be made transparent)")
     print()
     
-    processed = process_logos_for_transparency(input_directory, threshold=240)
+    store_dir = None if args.no_store else os.path.join(input_directory, STORE_DIRNAME)
+    report = process_logos_for_transparency(input_directory, threshold=args.threshold, workers=args.workers,
+                                            output_dir=args.output, store_dir=store_dir)
+    report.print_summary()
     
     print(f"\nBackground removal complete!")
-    print(f"Processed {processed} logo files")
-    print("Original files have been updated with transparent backgrounds")
\ No newline at end of file
+    print(f"Processed {report.processed} logo files")
+    print("Original files have been updated with transparent backgrounds")
+    if args.output:
+        print(f"Results written to {args.output}; originals left untouched")
@@ -0,0 +1,128 @@
+"""
+Batch Processing
+Runs a per-file logo operation over a folder on a process pool, with per-file timing and a failure report
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# The background removers are NumPy/SciPy bound and mostly hold the GIL, so files go to processes
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def logo_sources(input_dir):
+    """
+    PNG files in a folder (not subfolders) that the background removers
+    process; -black/-white color variants are skipped
+    """
+    paths = []
+    for filename in sorted(os.listdir(input_dir)):
+        if filename.lower().endswith('.png') and not filename.endswith('-black.png') and not filename.endswith('-white.png'):
+            path = os.path.join(input_dir, filename)
+            if not os.path.isdir(path):
+                paths.append(path)
+    return paths
+
+
+def _run_timed(func, input_path, output_path, kwargs):
+    """
+    Run one file; returns (seconds, error message or None, func's return
+    value) so a failure in a worker process comes back as data instead of
+    breaking the pool
+    """
+    start = time.perf_counter()
+    try:
+        status = func(input_path, output_path, **kwargs)
+    except Exception as e:
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}", None
+    return time.perf_counter() - start, None, status
+
+
+class BatchReport:
+    """
+    Per-file timings and failures from one process_files run
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.timings = {}   # filename -> seconds, successful files only
+        self.failures = {}  # filename -> error message
+        self.unchanged = set()  # filenames whose output was already up to date
+        self.elapsed = 0.0
+
+    @property
+    def processed(self):
+        return len(self.timings)
+
+    def print_summary(self):
+        """
+        Print the slowest files, the speedup over running them back to back, and every failure
+        """
+        busy = sum(self.timings.values())
+        print(f"\n⏱️ {self.processed} files in {self.elapsed:.2f}s wall "
+              f"({busy:.2f}s of work, {self.workers} worker{'s' if self.workers != 1 else ''})")
+        if self.unchanged:
+            print(f"  {len(self.unchanged)} already up to date")
+        slowest = sorted(self.timings.items(), key=lambda item: -item[1])[:5]
+        for name, seconds in slowest:
+            print(f"  {seconds:6.2f}s  {name}")
+
+        if self.failures:
+            print(f"\n❌ {len(self.failures)} file(s) failed:")
+            for name, error in sorted(self.failures.items()):
+                print(f"  {name}: {error}")
+
+
+def process_files(func, paths, workers=1, verb="Processed", output_dir=None, **kwargs):
+    """
+    Apply func(input_path, output_path, **kwargs) to every path, overwriting
+    it, or writing a file of the same name in output_dir
+
+    With workers > 1 the files are spread over a process pool; func and
+    kwargs must be picklable (module-level function, plain values). Each
+    file is reported as it finishes; a func returning "unchanged" is counted
+    as already up to date (see derivative_store.apply_stored). Returns a
+    BatchReport.
+    """
+    report = BatchReport(max(1, workers))
+    start = time.perf_counter()
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def output_for(path):
+        return os.path.join(output_dir, os.path.basename(path)) if output_dir else path
+
+    def record(path, result):
+        seconds, error, status = result
+        name = os.path.basename(path)
+        if error is None and status == "unchanged":
+            report.timings[name] = seconds
+            report.unchanged.add(name)
+            print(f"Unchanged: {name}")
+        elif error is None and status == "restored":
+            report.timings[name] = seconds
+            print(f"Restored from store: {name}")
+        elif error is None:
+            report.timings[name] = seconds
+            print(f"{verb}: {name} ({seconds:.2f}s)")
+        else:
+            report.failures[name] = error
+            print(f"Error processing {name}: {error}")
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            record(path, _run_timed(func, path, output_for(path), kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_timed, func, path, output_for(path), kwargs): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. out of memory), not just the operation
+                    result = (0.0, f"{type(e).__name__}: {e}", None)
+                record(futures[future], result)
+
+    report.elapsed = time.perf_counter() - start
+    return report
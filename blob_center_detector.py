@@ -5,28 +5,22 @@ Finds the center of each logo blob and automatically sizes extraction boxes
 """
 
 import os
+import argparse
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
 from sklearn.cluster import DBSCAN
 from collections import defaultdict
 import matplotlib.pyplot as plt
+from image_loader import load_sheet
+from crop_pipeline import CropWriter
+from png_encoding import ENCODE_PROFILES, DEFAULT_PROFILE
+from tiled_detection import strip_mask_builder, find_external_contours
 
-def detect_logo_centers(image_path, debug=True):
+def content_mask(gray):
     """
-    Detect centers of logo blobs using computer vision
+    Binary mask of non-white content, cleaned with small morphology
     """
-    # Load image
-    image = cv2.imread(image_path)
-    original = image.copy()
-    
-    # Convert to RGB for PIL compatibility
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    pil_image = Image.fromarray(image_rgb)
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
     # Create mask for non-white pixels (actual content)
     # White pixels have high values, content pixels have lower values
     _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
@@ -35,9 +29,29 @@ def detect_logo_centers(image_path, debug=True):
     kernel = np.ones((3,3), np.uint8)
     binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
     binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    return binary
+
+def detect_logo_centers(image, debug=True, tiled=False, strip_height=1024):
+    """
+    Detect centers of logo blobs using computer vision
     
-    # Find all contours (potential logo blobs)
-    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    image may be a SheetImage or a path. With tiled=True the mask is built in
+    overlapping horizontal strips so memory stays bounded on poster-size scans;
+    the detected blobs are the same as the full-image path.
+    """
+    # Load image (decoded once; PIL view shares the buffer)
+    sheet = load_sheet(image)
+    pil_image = sheet.pil
+    
+    if tiled:
+        # Close + open with 3x3 kernels reach 4 rows; 8 leaves margin
+        mask_rows = strip_mask_builder(sheet.gray_rows, sheet.height, content_mask, halo=8)
+        contours = find_external_contours(mask_rows, sheet.height, strip_height)
+    else:
+        binary = content_mask(sheet.gray)
+        
+        # Find all contours (potential logo blobs)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     # Filter contours by area (remove tiny artifacts)
     min_area = 1000  # Minimum area for a logo
@@ -91,7 +105,7 @@ def detect_logo_centers(image_path, debug=True):
     
     if debug:
         # Create debug visualization
-        debug_image = original.copy()
+        debug_image = cv2.cvtColor(sheet.pixels, cv2.COLOR_RGBA2BGR)
         
         for i, logo in enumerate(logo_centers):
             cx, cy = logo['center']
@@ -249,9 +263,12 @@ def create_extraction_preview(image, extraction_coords, output_file="blob_extrac
     
     return output_file
 
-def main():
+def main(png_profile=DEFAULT_PROFILE, png_report=False, tiled=False):
     """
     Main blob detection and extraction workflow
+    png_profile: PNG encode profile for the extracted logos (see png_encoding.ENCODE_PROFILES)
+    png_report: also report bytes saved per logo against the default encode
+    tiled: build the detection mask in strips with bounded memory (same blobs)
     """
     print("Blob Center Detection for Logo Extraction")
     print("=" * 50)
@@ -264,7 +281,8 @@ def main():
     
     # Step 1: Detect logo centers
     print("\n1. Detecting logo centers...")
-    logo_centers, pil_image = detect_logo_centers(image_path, debug=True)
+    sheet = load_sheet(image_path)
+    logo_centers, pil_image = detect_logo_centers(sheet, debug=True, tiled=tiled)
     
     # Step 2: Create smart extraction boxes
     print(f"\n2. Creating extraction boxes for {len(logo_centers)} detected logos...")
@@ -280,19 +298,19 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     extracted_count = 0
-    for coord in extraction_coords:
-        x, y, width, height = coord['x'], coord['y'], coord['width'], coord['height']
-        
-        # Extract logo region
-        logo_region = pil_image.crop((x, y, x + width, y + height))
-        
-        # Save extracted logo
-        filename = f"{coord['name']}.png"
-        output_path = os.path.join(output_dir, filename)
-        logo_region.save(output_path, "PNG")
-        extracted_count += 1
-        
-        print(f"  ✅ Extracted: {filename}")
+    # Crops are views of the sheet; PNG encodes overlap on a thread pool
+    with CropWriter(sheet, profile=png_profile, compare=png_report) as writer:
+        for coord in extraction_coords:
+            x, y, width, height = coord['x'], coord['y'], coord['width'], coord['height']
+            
+            # Save extracted logo region
+            filename = f"{coord['name']}.png"
+            output_path = os.path.join(output_dir, filename)
+            writer.submit(x, y, width, height, output_path)
+            extracted_count += 1
+            
+            print(f"  ✅ Extracted: {filename}")
+    writer.print_savings()
     
     print(f"\n📊 Summary:")
     print(f"Detected logo blobs: {len(logo_centers)}")
@@ -304,4 +322,13 @@ def main():
     return extraction_coords, html_file
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Blob center detection for logo extraction")
+    parser.add_argument("--png-profile", default=DEFAULT_PROFILE, choices=tuple(ENCODE_PROFILES),
+                        help="PNG encode profile: fast for tuning runs, max or palette for publishing")
+    parser.add_argument("--png-report", action="store_true",
+                        help="Also encode each logo with the default profile and report bytes saved (slower)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Detect strip by strip with bounded memory, for very large sheets")
+    args = parser.parse_args()
+    
+    main(png_profile=args.png_profile, png_report=args.png_report, tiled=args.tiled)
\ No newline at end of file
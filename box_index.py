@@ -0,0 +1,89 @@
+"""
+Box Index
+Grid-bucketed spatial index for (x, y, w, h) boxes and IoU-based non-maximum suppression
+"""
+
+from collections import defaultdict
+
+# Grid cell edge in pixels, about the size of a logo on the collection sheets
+DEFAULT_CELL_SIZE = 256
+
+
+def box_iou(a, b):
+    """
+    Intersection over union of two (x, y, w, h) boxes
+    """
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class BoxIndex:
+    """
+    Uniform grid of cell_size buckets; each box is listed in every cell it
+    covers, so a query only visits boxes that share a cell with it. A wide or
+    tall box costs more cells when inserted but never widens other queries,
+    unlike pruning on one sorted axis.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)  # (column, row) -> indices into _boxes
+        self._boxes = []
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def _cells_of(self, box):
+        x, y, w, h = box
+        size = self.cell_size
+        # Empty boxes still get the cell they start in
+        columns = range(int(x // size), int((x + max(w, 1) - 1) // size) + 1)
+        rows = range(int(y // size), int((y + max(h, 1) - 1) // size) + 1)
+        return ((column, row) for row in rows for column in columns)
+
+    def insert(self, box):
+        x, y, w, h = box
+        index = len(self._boxes)
+        self._boxes.append((x, y, w, h))
+        for cell in self._cells_of(box):
+            self._cells[cell].append(index)
+
+    def overlapping(self, box):
+        """
+        Yield stored boxes whose area intersects the query box
+        """
+        qx, qy, qw, qh = box
+        seen = set()
+        for cell in self._cells_of(box):
+            for index in self._cells.get(cell, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                x, y, w, h = self._boxes[index]
+                if x < qx + qw and x + w > qx and y < qy + qh and y + h > qy:
+                    yield (x, y, w, h)
+
+
+def suppress_overlapping_boxes(boxes, iou_threshold=0.5):
+    """
+    Greedy non-maximum suppression over (x, y, w, h) boxes
+
+    Boxes earlier in the list take priority, so callers pass their most
+    trusted detections first. Returns (kept_boxes, removed_count).
+    """
+    index = BoxIndex()
+    kept = []
+
+    for box in boxes:
+        if any(box_iou(box, other) > iou_threshold for other in index.overlapping(box)):
+            continue
+        index.insert(box)
+        kept.append(box)
+
+    return kept, len(boxes) - len(kept)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Color Quantization Backends
+Pluggable palette extraction for logo validation: exact KMeans, subsampled MiniBatchKMeans, or histogram median cut
+"""
+
+import time
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+BACKENDS = ("kmeans", "minibatch", "mediancut")
+DEFAULT_BACKEND = "kmeans"
+# Largest palette distance (RGB units) from exact KMeans counted as equivalent by benchmark_backends
+PALETTE_TOLERANCE = 20.0
+
+
+def _kmeans(pixels, n_colors):
+    """Full KMeans on every pixel (original behaviour)"""
+    kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
+    kmeans.fit(pixels)
+    counts = np.bincount(kmeans.labels_, minlength=n_colors)
+    return kmeans.cluster_centers_, counts
+
+
+def _minibatch(pixels, n_colors, max_samples=4096):
+    """MiniBatchKMeans fitted on an evenly strided (deterministic) pixel subsample"""
+    step = max(1, len(pixels) // max_samples)
+    sample = pixels[::step]
+    n_colors = min(n_colors, len(sample))
+
+    kmeans = MiniBatchKMeans(n_clusters=n_colors, random_state=42, n_init=3,
+                             batch_size=1024)
+    kmeans.fit(sample.astype(np.float32))
+
+    # Percentages come from assigning every pixel, not just the sample
+    labels = kmeans.predict(pixels.astype(np.float32))
+    counts = np.bincount(labels, minlength=n_colors)
+    return kmeans.cluster_centers_.astype(np.float64), counts
+
+
+def _mediancut(pixels, n_colors, bits=5, refine_steps=5):
+    """
+    Median cut over a 2^(3*bits)-bin color histogram
+
+    Each histogram bin stands in for its pixels at their mean color, so the
+    cost after one O(n) bincount depends on distinct bins, not pixel count.
+    """
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int32)
+    index = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+
+    n_bins = 1 << (3 * bits)
+    weights = np.bincount(index, minlength=n_bins)
+    occupied = np.flatnonzero(weights)
+    weights = weights[occupied].astype(np.float64)
+    sums = np.stack([np.bincount(index, weights=pixels[:, c], minlength=n_bins)[occupied]
+                     for c in range(3)], axis=1)
+    colors = sums / weights[:, None]
+
+    boxes = [np.arange(len(occupied))]
+    while len(boxes) < n_colors:
+        # Split the box with the widest weighted channel spread
+        best, best_score, best_channel = None, 0.0, 0
+        for i, members in enumerate(boxes):
+            if len(members) < 2:
+                continue
+            spans = colors[members].max(axis=0) - colors[members].min(axis=0)
+            channel = int(np.argmax(spans))
+            score = spans[channel] * weights[members].sum()
+            if score > best_score:
+                best, best_score, best_channel = i, score, channel
+        if best is None:
+            break
+
+        members = boxes.pop(best)
+        order = members[np.argsort(colors[members, best_channel], kind='stable')]
+        cumulative = np.cumsum(weights[order])
+        cut = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+        cut = min(max(cut, 1), len(order) - 1)
+        boxes.extend([order[:cut], order[cut:]])
+
+    centers = np.array([np.average(colors[m], axis=0, weights=weights[m]) for m in boxes])
+
+    # A few weighted Lloyd steps over the bins pull the cut boxes toward KMeans centers
+    for _ in range(refine_steps):
+        distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centers))
+        filled = totals > 0
+        for c in range(3):
+            centers[filled, c] = (np.bincount(labels, weights=weights * colors[:, c],
+                                              minlength=len(centers))[filled] / totals[filled])
+
+    distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    labels = distances.argmin(axis=1)
+    counts = np.bincount(labels, weights=weights, minlength=len(centers)).astype(np.int64)
+    return centers, counts
+
+
+_QUANTIZERS = {
+    "kmeans": _kmeans,
+    "minibatch": _minibatch,
+    "mediancut": _mediancut,
+}
+
+
+def quantize_colors(pixels, n_colors, backend=DEFAULT_BACKEND):
+    """
+    Reduce an (N, 3) uint8 pixel array to at most n_colors palette entries
+
+    Returns (centers, counts): float (k, 3) cluster centers and the number
+    of pixels assigned to each.
+    """
+    if backend not in _QUANTIZERS:
+        raise ValueError(f"Unknown color backend '{backend}', expected one of {BACKENDS}")
+    return _QUANTIZERS[backend](pixels, n_colors)
+
+
+def palette_distance(reference, candidate):
+    """
+    Percentage-weighted mean RGB distance from each reference color to its nearest candidate color
+    """
+    ref_centers, ref_counts = reference
+    cand_centers, _ = candidate
+    distances = np.linalg.norm(ref_centers[:, None, :] - cand_centers[None, :, :], axis=2).min(axis=1)
+    return float(np.average(distances, weights=ref_counts))
+
+
+def benchmark_backends(image_paths=("client-logos-collection.png", "client-logos-collection-v2.png"),
+                       window=(300, 150), n_colors=8, tolerance=PALETTE_TOLERANCE):
+    """
+    Time every backend on logo-sized windows of the bundled sheets and check
+    it against exact KMeans
+
+    Two checks per region: the palette distance must stay within tolerance
+    (RGB units), and the color-inconsistency verdict the validation derives
+    from the palette (logo_validation.hue_inconsistencies) must agree.
+    Returns {backend: (regions within tolerance, regions with the same verdict, regions)}.
+    """
+    from image_loader import load_sheet
+    from logo_validation import palette_array, hue_inconsistencies
+
+    regions = []
+    for path in image_paths:
+        sheet = load_sheet(path)
+        ww, wh = window
+        for y in range(0, sheet.height - wh + 1, wh):
+            for x in range(0, sheet.width - ww + 1, ww):
+                pixels = np.ascontiguousarray(sheet.rgb[y:y + wh, x:x + ww]).reshape(-1, 3)
+                pixels = pixels[pixels.sum(axis=1, dtype=np.int32) < 720]
+                if len(pixels) >= n_colors:
+                    regions.append(pixels)
+
+    def verdicts(palettes):
+        # Same palette handling as analyze_color_scheme / validate_boxes
+        array, counts = palette_array([centers.astype(int) for centers, _ in palettes], n_colors)
+        return hue_inconsistencies(array, counts)
+
+    print(f"Benchmarking {len(regions)} regions ({window[0]}x{window[1]}) from {len(image_paths)} sheets, "
+          f"palette tolerance {tolerance:g}")
+    reference = None
+    reference_verdicts = None
+    summary = {}
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        palettes = [quantize_colors(p, n_colors, backend) for p in regions]
+        elapsed = time.perf_counter() - start
+        flags = verdicts(palettes)
+
+        if reference is None:
+            reference, reference_verdicts = palettes, flags
+            print(f"  {backend:10s} {elapsed:7.2f}s  (reference, {int(flags.sum())} regions flagged)")
+            continue
+
+        distances = np.array([palette_distance(r, c) for r, c in zip(reference, palettes)])
+        within = int((distances <= tolerance).sum())
+        agree = int((flags == reference_verdicts).sum())
+        summary[backend] = (within, agree, len(regions))
+        ok = within == len(regions) and agree == len(regions)
+        print(f"  {backend:10s} {elapsed:7.2f}s  "
+              f"mean palette distance {distances.mean():5.1f}, max {distances.max():5.1f}, "
+              f"{within}/{len(regions)} within tolerance; "
+              f"verdicts agree {agree}/{len(regions)} ({int(flags.sum())} flagged) {'✅' if ok else '⚠️'}")
+    if any(agree < total for _, agree, total in summary.values()):
+        print("⚠️ Fast backends change some color-inconsistency verdicts; "
+              "keep kmeans for runs that publish to validated-logos/")
+    return summary
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")  # KMeans warns on regions with few distinct colors
+    benchmark_backends()
@@ -0,0 +1,160 @@
+"""
+Derivative Store
+Content-addressed results of per-file logo operations, keyed by source hash, operation and parameters
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+
+from extraction_manifest import file_sha256
+
+STORE_DIRNAME = ".derivative-store"
+# Parameters that change how a result is computed but not the result itself
+OUTPUT_NEUTRAL_PARAMS = ("tile_size",)
+
+
+def operation_name(func):
+    """
+    Stable name of an operation for store keys: background_remover.remove_background
+    """
+    module = func.__module__
+    if module == "__main__":
+        # Same key whether the script is run directly or imported
+        main_file = getattr(sys.modules["__main__"], "__file__", None)
+        if main_file:
+            module = os.path.splitext(os.path.basename(main_file))[0]
+    return f"{module}.{func.__qualname__}"
+
+
+class DerivativeStore:
+    """
+    On-disk store of operation results:
+
+        sources/<sha256>.png        original bytes, kept the first time a file is seen
+        derived/<key>.png           result of one operation with one parameter set
+        outputs/<sha256>.json       {"source", "operation", "params"} for each result
+
+    key hashes (source hash, operation, params), so a result is computed once
+    per distinct input and parameter set. Because every result is indexed by
+    its own hash, a file that was already overwritten by an operation is
+    traced back to its original: running again is a no-op, and running with
+    new parameters starts from the original instead of the processed copy.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        for sub in ("sources", "derived", "outputs"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    @staticmethod
+    def key(source_hash, operation, params):
+        params = {k: v for k, v in params.items() if k not in OUTPUT_NEUTRAL_PARAMS}
+        payload = json.dumps([source_hash, operation, params], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, sub, name, ext):
+        return os.path.join(self.root, sub, f"{name}.{ext}")
+
+    @staticmethod
+    def _write_atomic(path, write):
+        # Per-process temp name: workers may race on the same key and both win
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def origin(self, file_hash, operation):
+        """
+        Source hash a file was derived from by this operation, or None if it
+        is not one of the operation's results
+        """
+        try:
+            with open(self._path("outputs", file_hash, "json")) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return record["source"] if record["operation"] == operation else None
+
+    def add_source(self, input_path):
+        """
+        Keep a copy of a source file (once) and return its hash
+        """
+        source_hash = file_sha256(input_path)
+        source_path = self._path("sources", source_hash, "png")
+        if not os.path.exists(source_path):
+            self._write_atomic(source_path, lambda tmp: shutil.copyfile(input_path, tmp))
+        return source_hash
+
+    def result_path(self, source_hash, operation, params):
+        """
+        Where the result for (source, operation, params) is or would be stored
+        """
+        return self._path("derived", self.key(source_hash, operation, params), "png")
+
+    def put(self, source_hash, operation, params, write):
+        """
+        Store a result produced by write(tmp_path) and index it by its own hash
+        """
+        result_path = self.result_path(source_hash, operation, params)
+        self._write_atomic(result_path, write)
+        record = {"source": source_hash, "operation": operation,
+                  "params": {k: v for k, v in params.items() if k not in OUTPUT_NEUTRAL_PARAMS}}
+
+        def write_record(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(record, f, indent=2)
+
+        self._write_atomic(self._path("outputs", file_sha256(result_path), "json"), write_record)
+        return result_path
+
+    def apply(self, func, input_path, **params):
+        """
+        Path of func(source, output, **params) in the store, computing it only on a miss
+
+        Returns (result_path, computed).
+        """
+        operation = operation_name(func)
+        source_hash = self.origin(file_sha256(input_path), operation)
+        if source_hash is None:
+            source_hash = self.add_source(input_path)
+        source_path = self._path("sources", source_hash, "png")
+
+        result_path = self.result_path(source_hash, operation, params)
+        if os.path.exists(result_path):
+            return result_path, False
+
+        self.put(source_hash, operation, params, lambda tmp: func(source_path, tmp, **params))
+        return result_path, True
+
+
+def publish(result_path, output_path):
+    """
+    Copy a stored result to output_path unless it already holds the same
+    bytes; returns "unchanged" or "written"
+    """
+    if os.path.exists(output_path) and file_sha256(output_path) == file_sha256(result_path):
+        return "unchanged"
+    DerivativeStore._write_atomic(output_path, lambda tmp: shutil.copyfile(result_path, tmp))
+    return "written"
+
+
+def apply_stored(input_path, output_path, operation, store_dir, **params):
+    """
+    process_files-compatible wrapper: operation(input, output, **params)
+    through the store in store_dir
+
+    The output is only written when its bytes would change. Returns
+    "unchanged", "restored" (result came from the store) or "computed".
+    """
+    store = DerivativeStore(store_dir)
+    result_path, computed = store.apply(operation, input_path, **params)
+
+    if publish(result_path, output_path) == "unchanged":
+        return "unchanged"
+    return "computed" if computed else "restored"
@@ -7,20 +7,41 @@ Uses advanced computer vision techniques for precise logo boundary detection
 
 import os
 import json
+import argparse
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import ImageDraw, ImageFilter
 from sklearn.cluster import DBSCAN
 import matplotlib.pyplot as plt
 from collections import defaultdict
+from image_loader import load_sheet, DEFAULT_CACHE_DIR
+from crop_pipeline import CropWriter, crop_image
+from png_encoding import ENCODE_PROFILES, DEFAULT_PROFILE
+from integral_image import IntegralImage
+from tiled_detection import strip_mask_builder, find_external_contours
+
+def _content_bounds(mask):
+    """
+    (min_row, max_row, min_col, max_col) of the True pixels in a box's mask,
+    or None if it is empty; matches IntegralImage.content_bounds
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(rows[0]), int(rows[-1]), int(cols[0]), int(cols[-1])
 
 class EnhancedLogoDetectorV2:
-    def __init__(self, image_path="client-logos-collection-v2.png"):
-        self.image_path = image_path
-        self.image = Image.open(image_path)
-        self.image_cv = cv2.imread(image_path)
-        self.image_rgb = cv2.cvtColor(self.image_cv, cv2.COLOR_BGR2RGB)
-        self.gray = cv2.cvtColor(self.image_cv, cv2.COLOR_BGR2GRAY)
+    def __init__(self, image="client-logos-collection-v2.png", cache_dir=DEFAULT_CACHE_DIR):
+        # Decode once (or memory-map from the pixel cache); PIL and grayscale views share the buffer
+        self.sheet = load_sheet(image, cache_dir=cache_dir)
+        self.image_path = self.sheet.path
+        self.image = self.sheet.pil
+        
+        # Summed-area tables, built once per sheet on first use
+        self._content_table = None
+        self._luma_table = None
+        self._luma_content_table = None
         
         # Known company names for the V2 layout (based on visual inspection)
         self.expected_companies = [
@@ -48,12 +69,17 @@ class EnhancedLogoDetectorV2:
             "Raytheon Company"
         ]
 
-    def detect_content_regions(self):
+    @property
+    def gray(self):
+        """Full grayscale plane (decoded on first use; tiled detection avoids it)"""
+        return self.sheet.gray
+
+    def _connected_content_mask(self, gray):
         """
-        Use advanced computer vision to detect actual content regions
+        Binary mask with text elements joined into logo-sized blobs
         """
         # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(self.gray, (5, 5), 0)
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
         
         # Use adaptive thresholding to handle varying lighting
         binary = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
@@ -61,10 +87,25 @@ class EnhancedLogoDetectorV2:
         
         # Apply morphological operations to connect text elements
         kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 8))
-        connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+
+    def detect_content_regions(self, tiled=False, strip_height=1024):
+        """
+        Use advanced computer vision to detect actual content regions
         
-        # Find contours
-        contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        With tiled=True the mask is built in horizontal strips (bounded memory)
+        and contours crossing strip seams are stitched; the result is the same.
+        """
+        if tiled:
+            # Blur (2) + adaptive threshold (5) + 15x8 close (8) rows of footprint
+            mask_rows = strip_mask_builder(self.sheet.gray_rows, self.sheet.height,
+                                           self._connected_content_mask, halo=32)
+            contours = find_external_contours(mask_rows, self.sheet.height, strip_height)
+        else:
+            connected = self._connected_content_mask(self.gray)
+            
+            # Find contours
+            contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         # Filter contours by area and aspect ratio
         valid_contours = []
@@ -83,25 +124,30 @@ class EnhancedLogoDetectorV2:
         
         return valid_contours
 
-    def refine_bounding_boxes(self, contours):
+    def refine_bounding_boxes(self, contours, tiled=False):
         """
         Refine bounding boxes using content-aware analysis
+        
+        With tiled=True each box's content bounds come from that box's own rows
+        instead of a sheet-sized summed-area table; the boxes are the same.
         """
         refined_boxes = []
         
+        if not tiled and self._content_table is None:
+            self._content_table = IntegralImage(self.gray < 240)  # Non-white pixels
+        
         for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
             
-            # Extract the region
-            region = self.gray[y:y+h, x:x+w]
-            
             # Find the actual content bounds within this region
-            content_coords = np.where(region < 240)  # Non-white pixels
+            if tiled:
+                bounds = _content_bounds(self.sheet.gray_rows(y, y + h)[:, x:x + w] < 240)
+            else:
+                bounds = self._content_table.content_bounds(x, y, w, h)
             
-            if len(content_coords[0]) > 0:
+            if bounds is not None:
                 # Get tight bounds around actual content
-                min_row, max_row = content_coords[0].min(), content_coords[0].max()
-                min_col, max_col = content_coords[1].min(), content_coords[1].max()
+                min_row, max_row, min_col, max_col = bounds
                 
                 # Add padding
                 padding = 10
@@ -177,27 +223,41 @@ class EnhancedLogoDetectorV2:
         
         return assigned_logos
 
-    def validate_extractions(self, logos):
+    def validate_extractions(self, logos, tiled=False):
         """
         Validate logo extractions using multiple criteria
+        
+        With tiled=True only each box's luminance is converted and summed,
+        instead of the whole sheet's; the metrics are the same.
         """
         validated_logos = []
         
+        # Same luminance as region.convert('L'), summed once for the whole sheet
+        if not tiled and self._luma_table is None:
+            self._luma_table = IntegralImage(self.sheet.luma)
+            self._luma_content_table = IntegralImage(self.sheet.luma < 240)
+        
         for logo in logos:
             coords = logo['coordinates']
             x, y, w, h = coords['x'], coords['y'], coords['width'], coords['height']
             
-            # Extract region for analysis
-            region = self.image.crop((x, y, x + w, y + h))
-            region_array = np.array(region.convert('L'))
+            if tiled:
+                # Tables over this box only; the crop pads past the edge with 0 like the sheet tables
+                luma = np.asarray(crop_image(self.sheet, x, y, w, h).convert('L'))
+                luma_table, content_table = IntegralImage(luma), IntegralImage(luma < 240)
+                bx, by = 0, 0
+            else:
+                luma_table, content_table = self._luma_table, self._luma_content_table
+                bx, by = x, y
             
-            # Calculate validation metrics
+            # Calculate validation metrics (O(1) per box via the integral images)
+            content_density = content_table.rect_mean(bx, by, w, h)
             validation = {
-                'has_content': np.mean(region_array < 240) > 0.05,  # At least 5% non-white
+                'has_content': content_density > 0.05,  # At least 5% non-white
                 'good_size': 1000 < (w * h) < 40000,  # Reasonable size
                 'good_aspect': 0.5 < (w/h) < 6.0,  # Reasonable aspect ratio
-                'content_density': np.mean(region_array < 240),
-                'edge_content': self._check_edge_content(region_array)
+                'content_density': content_density,
+                'edge_content': self._check_edge_content(bx, by, w, h, luma_table=luma_table)
             }
             
             # Score the extraction
@@ -216,19 +276,15 @@ class EnhancedLogoDetectorV2:
         
         return validated_logos
 
-    def _check_edge_content(self, image_array, border_size=5):
+    def _check_edge_content(self, x, y, w, h, border_size=5, luma_table=None):
         """
-        Check if there's significant content near the edges
+        Check if there's significant content near the edges of a box
         """
-        h, w = image_array.shape
-        
-        # Check each edge
-        top_edge = np.mean(image_array[:border_size, :]) < 240
-        bottom_edge = np.mean(image_array[-border_size:, :]) < 240
-        left_edge = np.mean(image_array[:, :border_size]) < 240
-        right_edge = np.mean(image_array[:, -border_size:]) < 240
+        # Each edge strip's mean luminance comes from the integral image
+        luma_table = luma_table or self._luma_table
+        edge_means = luma_table.border_means(x, y, w, h, border_size)
         
-        return any([top_edge, bottom_edge, left_edge, right_edge])
+        return any(mean < 240 for mean in edge_means)
 
     def create_visual_preview(self, logos, output_path="enhanced_detection_preview_v2.html"):
         """
@@ -399,33 +455,40 @@ Edge Content: {'⚠️' if validation['edge_content'] else '✅'}
         
         return output_path
 
-    def extract_valid_logos(self, logos, output_dir="enhanced-logos-v2"):
+    def extract_valid_logos(self, logos, output_dir="enhanced-logos-v2", png_profile=DEFAULT_PROFILE,
+                            png_report=False):
         """
         Extract only the valid logos to files
+        png_profile: PNG encode profile (see png_encoding.ENCODE_PROFILES)
+        png_report: also report bytes saved per logo against the default encode
         """
         os.makedirs(output_dir, exist_ok=True)
         extracted_count = 0
         
-        for logo in logos:
-            if logo['is_valid']:
-                coords = logo['coordinates']
-                x, y, w, h = coords['x'], coords['y'], coords['width'], coords['height']
-                
-                # Extract the logo region
-                logo_region = self.image.crop((x, y, x + w, y + h))
-                
-                # Save the logo
-                output_path = os.path.join(output_dir, logo['filename'])
-                logo_region.save(output_path, "PNG")
-                extracted_count += 1
-                
-                print(f"✅ Extracted: {logo['filename']} - {logo['company']}")
+        # Crops are views of the sheet; PNG encodes overlap on a thread pool
+        with CropWriter(self.sheet, profile=png_profile, compare=png_report) as writer:
+            for logo in logos:
+                if logo['is_valid']:
+                    coords = logo['coordinates']
+                    x, y, w, h = coords['x'], coords['y'], coords['width'], coords['height']
+                    
+                    # Save the logo region
+                    output_path = os.path.join(output_dir, logo['filename'])
+                    writer.submit(x, y, w, h, output_path)
+                    extracted_count += 1
+                    
+                    print(f"✅ Extracted: {logo['filename']} - {logo['company']}")
+        writer.print_savings()
         
         return extracted_count
 
-    def run_detection(self):
+    def run_detection(self, png_profile=DEFAULT_PROFILE, png_report=False, tiled=False):
         """
         Run the complete detection pipeline
+        png_profile: PNG encode profile for the extracted logos
+        png_report: also report bytes saved per logo against the default encode
+        tiled: detect, refine and validate strip by strip or box by box, never
+            holding a sheet-sized plane (same results, for very large sheets)
         """
         print("Enhanced Logo Detection V2")
         print("=" * 50)
@@ -434,12 +497,12 @@ Edge Content: {'⚠️' if validation['edge_content'] else '✅'}
         
         # Step 1: Detect content regions
         print("\n1. Detecting content regions...")
-        contours = self.detect_content_regions()
+        contours = self.detect_content_regions(tiled=tiled)
         print(f"   Found {len(contours)} potential regions")
         
         # Step 2: Refine bounding boxes
         print("\n2. Refining bounding boxes...")
-        boxes = self.refine_bounding_boxes(contours)
+        boxes = self.refine_bounding_boxes(contours, tiled=tiled)
         print(f"   Refined to {len(boxes)} valid boxes")
         
         # Step 3: Cluster into rows
@@ -454,7 +517,7 @@ Edge Content: {'⚠️' if validation['edge_content'] else '✅'}
         
         # Step 5: Validate extractions
         print("\n5. Validating extractions...")
-        validated_logos = self.validate_extractions(logos)
+        validated_logos = self.validate_extractions(logos, tiled=tiled)
         valid_count = len([l for l in validated_logos if l['is_valid']])
         print(f"   {valid_count}/{len(validated_logos)} passed validation")
         
@@ -465,7 +528,8 @@ Edge Content: {'⚠️' if validation['edge_content'] else '✅'}
         
         # Step 7: Extract valid logos
         print("\n7. Extracting valid logos...")
-        extracted_count = self.extract_valid_logos(validated_logos)
+        extracted_count = self.extract_valid_logos(validated_logos, png_profile=png_profile,
+                                                   png_report=png_report)
         print(f"   Extracted {extracted_count} valid logos")
         
         # Step 8: Save metadata
@@ -493,5 +557,15 @@ Edge Content: {'⚠️' if validation['edge_content'] else '✅'}
         return validated_logos, preview_file
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enhanced logo detection V2")
+    parser.add_argument("--png-profile", default=DEFAULT_PROFILE, choices=tuple(ENCODE_PROFILES),
+                        help="PNG encode profile: fast for tuning runs, max or palette for publishing")
+    parser.add_argument("--png-report", action="store_true",
+                        help="Also encode each logo with the default profile and report bytes saved (slower)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Detect strip by strip with bounded memory, for very large sheets")
+    args = parser.parse_args()
+    
     detector = EnhancedLogoDetectorV2()
-    results, preview = detector.run_detection()
\ No newline at end of file
+    results, preview = detector.run_detection(png_profile=args.png_profile, png_report=args.png_report,
+                                              tiled=args.tiled)
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Extraction Manifest
+Remembers which logo crops were written from which sheet and box, so incremental runs only redo edited boxes
+"""
+
+import os
+import json
+import hashlib
+
+from png_encoding import DEFAULT_PROFILE
+
+MANIFEST_FILE = "extraction-manifest.json"
+
+
+def file_sha256(path):
+    """
+    SHA-256 of a file's bytes (hex)
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """
+    Per output directory record of every extracted logo:
+
+        {"logo-nasa.png": {"sheet": <content hash>, "box": [x, y, w, h],
+                           "profile": <PNG encode profile>,
+                           "validation": {...}, "sha256": <hash of the PNG>}}
+
+    An entry is current when the sheet pixels, box and encode profile are
+    unchanged and the PNG on disk still has the recorded hash, so deleted or
+    hand-edited outputs are rewritten too.
+    """
+
+    def __init__(self, output_dir, sheet, profile=DEFAULT_PROFILE, filename=MANIFEST_FILE):
+        self.path = os.path.join(output_dir, filename)
+        self.output_dir = output_dir
+        self.sheet_hash = sheet.content_hash
+        self.profile = profile
+
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError):
+                self.entries = {}
+
+    @staticmethod
+    def _box(coord):
+        return [coord['x'], coord['y'], coord['width'], coord['height']]
+
+    @staticmethod
+    def _summary(validation):
+        return {
+            'needs_adjustment': bool(validation['needs_adjustment']),
+            'color_inconsistencies': bool(validation['color_inconsistencies']),
+            'border_content_count': int(validation['border_content_count']),
+            'contour_count': int(validation['contour_count']),
+        }
+
+    def is_current(self, filename, coord):
+        """
+        True if filename was written from this sheet and box and is untouched since
+        """
+        entry = self.entries.get(filename)
+        if entry is None or entry['sheet'] != self.sheet_hash or entry['box'] != self._box(coord):
+            return False
+        if entry.get('profile', DEFAULT_PROFILE) != self.profile:
+            return False
+        output_path = os.path.join(self.output_dir, filename)
+        return os.path.exists(output_path) and file_sha256(output_path) == entry['sha256']
+
+    def record(self, filename, coord, validation):
+        """
+        Store the box, its validation summary and the hash of the PNG just written
+        """
+        self.entries[filename] = {
+            'sheet': self.sheet_hash,
+            'box': self._box(coord),
+            'profile': self.profile,
+            'validation': self._summary(validation),
+            'sha256': file_sha256(os.path.join(self.output_dir, filename)),
+        }
+
+    def update_validation(self, filename, validation):
+        """
+        Refresh the stored validation summary of an entry whose PNG is unchanged
+        """
+        if filename in self.entries:
+            self.entries[filename]['validation'] = self._summary(validation)
+
+    def save(self):
+        """
+        Write the manifest atomically
+        """
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_file, self.path)
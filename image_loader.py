@@ -0,0 +1,191 @@
+"""
+Shared Image Loader
+Decodes a logo collection sheet once and exposes PIL, NumPy and grayscale views of the same pixels
+"""
+
+import os
+import re
+import hashlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Decoded-pixel cache used by the coordinate-tuning scripts
+DEFAULT_CACHE_DIR = ".pixel-cache"
+
+
+def read_icc_profile(path):
+    """
+    Embedded ICC profile of an image file, or None
+
+    Only the header is parsed; the pixels are not decoded.
+    """
+    with Image.open(path) as image:
+        return image.info.get('icc_profile')
+
+
+class SheetImage:
+    def __init__(self, pixels, path=None, icc_profile=None):
+        """
+        Wrap an already decoded sheet
+
+        Args:
+            pixels (np.ndarray): RGBA uint8 buffer of shape (height, width, 4)
+            path (str): Path the pixels were decoded from, if any
+            icc_profile (bytes): Embedded color profile, carried over to every crop saved from the sheet
+        """
+        if pixels.ndim != 3 or pixels.shape[2] != 4 or pixels.dtype != np.uint8:
+            raise ValueError(f"Expected an RGBA uint8 buffer, got {pixels.dtype} {pixels.shape}")
+
+        self.path = path
+        self.icc_profile = icc_profile
+        self.pixels = np.ascontiguousarray(pixels)
+        self.height, self.width = self.pixels.shape[:2]
+
+        # Views are built on first use and cached
+        self._pil = None
+        self._gray = None
+        self._luma = None
+        self._content_hash = None
+
+    @classmethod
+    def open(cls, path):
+        """
+        Decode an image file into a single RGBA buffer
+        """
+        pixels = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+        if pixels is None:
+            raise FileNotFoundError(f"Could not decode image '{path}'")
+
+        if pixels.dtype == np.uint16:
+            pixels = (pixels >> 8).astype(np.uint8)
+
+        # OpenCV decodes to BGR(A); normalise to RGBA so PIL can map the buffer directly
+        if pixels.ndim == 2:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_GRAY2RGBA)
+        elif pixels.shape[2] == 3:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_BGR2RGBA)
+        else:
+            cv2.cvtColor(pixels, cv2.COLOR_BGRA2RGBA, dst=pixels)
+
+        # OpenCV ignores the iCCP chunk; read it from the PNG header
+        return cls(pixels, path=str(path), icc_profile=read_icc_profile(path))
+
+    @classmethod
+    def open_cached(cls, path, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Open a sheet through an on-disk cache of decoded pixels
+        
+        The first run decodes the PNG and saves the RGBA buffer as .npy; later
+        runs memory-map it read-only instead of inflating the PNG again. Entries
+        are keyed by the sheet's resolved path, content hash and mtime, so
+        edited sheets miss and same-named sheets in other folders never collide.
+        """
+        path = Path(path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        mtime_ns = path.stat().st_mtime_ns
+        path_key = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:8]
+        prefix = f"{path.stem}-{path_key}"
+
+        cache_dir = Path(cache_dir)
+        cache_file = cache_dir / f"{prefix}-{digest}-{mtime_ns}.npy"
+
+        if cache_file.exists():
+            try:
+                pixels = np.load(cache_file, mmap_mode='r')
+                return cls(pixels, path=str(path), icc_profile=read_icc_profile(path))
+            except (ValueError, OSError):
+                pass  # Truncated or corrupt entry; rebuild it below
+
+        sheet = cls.open(path)
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Drop stale entries for this sheet (and only this sheet) before writing the new one
+        entry = re.compile(rf"{re.escape(prefix)}-[0-9a-f]{{16}}-\d+\.npy")
+        for stale in cache_dir.glob(f"{prefix}-*.npy"):
+            if entry.fullmatch(stale.name):
+                stale.unlink()
+        tmp_file = cache_file.with_suffix('.tmp.npy')
+        np.save(tmp_file, sheet.pixels)
+        os.replace(tmp_file, cache_file)
+
+        return sheet
+
+    @property
+    def size(self):
+        """(width, height), matching PIL's convention"""
+        return self.width, self.height
+
+    @property
+    def content_hash(self):
+        """
+        SHA-256 of the decoded pixels (hex, truncated), computed once
+        """
+        if self._content_hash is None:
+            digest = hashlib.sha256(self.pixels.shape.__repr__().encode())
+            digest.update(memoryview(self.pixels).cast('B'))
+            self._content_hash = digest.hexdigest()[:16]
+        return self._content_hash
+
+    @property
+    def rgb(self):
+        """RGB view of the buffer (no copy, not contiguous)"""
+        return self.pixels[:, :, :3]
+
+    @property
+    def alpha(self):
+        """Alpha view of the buffer (no copy, not contiguous)"""
+        return self.pixels[:, :, 3]
+
+    @property
+    def pil(self):
+        """
+        Read-only PIL image backed by the same memory as the NumPy buffer
+        """
+        if self._pil is None:
+            self._pil = Image.frombuffer('RGBA', self.size, self.pixels, 'raw', 'RGBA', 0, 1)
+            if self.icc_profile:
+                self._pil.info['icc_profile'] = self.icc_profile
+        return self._pil
+
+    @property
+    def gray(self):
+        """
+        Grayscale plane, computed once on first access
+        """
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.pixels, cv2.COLOR_RGBA2GRAY)
+        return self._gray
+
+    def gray_rows(self, y0, y1):
+        """
+        Grayscale rows [y0, y1), converted on demand without caching the full plane
+        """
+        if self._gray is not None:
+            return self._gray[y0:y1]
+        return cv2.cvtColor(self.pixels[y0:y1], cv2.COLOR_RGBA2GRAY)
+
+    @property
+    def luma(self):
+        """
+        PIL-compatible luminance plane (same values as image.convert('L')), computed once
+        """
+        if self._luma is None:
+            self._luma = np.asarray(self.pil.convert('L'))
+        return self._luma
+
+
+def load_sheet(image, cache_dir=None):
+    """
+    Return a SheetImage for either an existing SheetImage or a path to decode
+
+    With cache_dir set, paths go through the memory-mapped pixel cache.
+    """
+    if isinstance(image, SheetImage):
+        return image
+    if cache_dir is not None:
+        return SheetImage.open_cached(image, cache_dir)
+    return SheetImage.open(image)
@@ -7,6 +7,52 @@ Allows easy switching between different logo layout options for the website
 import json
 import shutil
 from datetime import datetime
+from pathlib import Path
+from logo_derivatives import (generate_derivatives, available_formats, derivative_sources,
+                              DERIVATIVE_FORMATS)
+from logo_atlas import build_atlas
+from logo_variants import (generate_variants, existing_variants, srcset_attribute, sizes_attribute,
+                           VARIANT_DIR)
+
+def logo_picture(logo, layout, indent=0):
+    """
+    Markup for one logo in a layout (a key of logo_variants.DISPLAY_BOXES)
+    
+    With size variants on disk the <img> gets srcset/sizes for the layout's
+    display box; AVIF/WebP derivatives become <picture> sources. Without
+    either, this is the plain <img>.
+    """
+    pad = " " * indent
+    png_path = f"logos/{logo['filename']}"
+    alt = logo['alt']
+    
+    srcset = srcset_attribute(png_path)
+    if srcset:
+        sizes = sizes_attribute(png_path, layout)
+        img = f'<img src="{png_path}" srcset="{srcset}" sizes="{sizes}" alt="{alt}" loading="lazy">'
+        # A format is only offered when every width has a derivative
+        widths = [width for width, _ in existing_variants(png_path)]
+        sources = [f'<source type="{spec["mime"]}" srcset="{srcset_attribute(png_path, fmt)}" sizes="{sizes}">'
+                   for fmt, spec in DERIVATIVE_FORMATS.items()
+                   if [width for width, _ in existing_variants(png_path, fmt)] == widths]
+    else:
+        img = f'<img src="{png_path}" alt="{alt}" loading="lazy">'
+        sources = [f'<source type="{mime}" srcset="{path.as_posix()}">'
+                   for mime, path in derivative_sources(png_path)]
+    
+    if not sources:
+        return pad + img
+    
+    lines = [f"{pad}<picture>"]
+    lines.extend(f"{pad}    {source}" for source in sources)
+    lines.append(f"{pad}    {img}")
+    lines.append(f"{pad}</picture>")
+    return "\n".join(lines)
+
+def atlas_css_for(atlas):
+    """Sprite CSS written next to the atlas image by logo_atlas.build_atlas"""
+    with open(Path(atlas['image']).with_suffix('.css')) as f:
+        return f.read().rstrip()
 
 def load_logo_mapping():
     """Load the enhanced logo mapping"""
@@ -21,15 +67,26 @@ def backup_current_layout():
     print(f"✅ Current layout backed up as: {backup_name}")
     return backup_name
 
-def implement_ticker_layout():
-    """Option 1: Animated Ticker Layout"""
+def implement_ticker_layout(atlas=None):
+    """
+    Option 1: Animated Ticker Layout
+    
+    With an atlas offset map (from logo_atlas.build_atlas) the logos are
+    sprites of one shared image positioned with background-position.
+    """
     logos = load_logo_mapping()['logos']
+    sprites = atlas['sprites'] if atlas else {}
     
     # Generate ticker HTML
     ticker_items = []
     for logo in logos:
+        if logo['filename'] in sprites:
+            sprite_class = sprites[logo['filename']]['class']
+            image = f'''                    <span class="logo-sprite {sprite_class}" role="img" aria-label="{logo['alt']}"></span>'''
+        else:
+            image = logo_picture(logo, "ticker", indent=20)
         item = f'''                <div class="logo-ticker-item" data-company="{logo['company']}">
-                    <img src="logos/{logo['filename']}" alt="{logo['alt']}" loading="lazy">
+{image}
                 </div>'''
         ticker_items.append(item)
     
@@ -133,6 +190,19 @@ def implement_ticker_layout():
             }
         }'''
     
+    if sprites:
+        ticker_css += '''
+
+        .logo-ticker-item .logo-sprite {
+            transition: all 0.4s ease;
+        }
+
+        .logo-ticker-item:hover .logo-sprite {
+            transform: scale(1.05);
+        }
+
+''' + atlas_css_for(atlas)
+    
     return ticker_html, ticker_css
 
 def implement_sector_layout():
@@ -159,7 +229,7 @@ def implement_sector_layout():
             logo_items = []
             for logo in sector_data['logos'][:8]:  # Limit to 8 per sector
                 logo_items.append(f'''                        <div class="sector-logo">
-                            <img src="logos/{logo['filename']}" alt="{logo['alt']}" loading="lazy">
+{logo_picture(logo, "sector", indent=28)}
                         </div>''')
             
             card = f'''                <div class="sector-card">
@@ -286,13 +356,13 @@ def implement_spotlight_layout():
     premium_items = []
     for logo in premium_logos:
         premium_items.append(f'''                        <div class="spotlight-logo">
-                            <img src="logos/{logo['filename']}" alt="{logo['alt']}" loading="lazy">
+{logo_picture(logo, "spotlight", indent=28)}
                         </div>''')
     
     regular_items = []
     for logo in regular_logos[:12]:  # Limit regular items
         regular_items.append(f'''                <div class="spotlight-regular">
-                    <img src="logos/{logo['filename']}" alt="{logo['alt']}" loading="lazy">
+{logo_picture(logo, "spotlight-regular", indent=20)}
                 </div>''')
     
     spotlight_html = f'''    <!-- Spotlight Feature Section -->
@@ -426,6 +496,16 @@ def update_website_with_layout(layout_choice):
     # Create backup
     backup_file = backup_current_layout()
     
+    # Refresh 1x/2x/3x size variants and their AVIF/WebP derivatives so the
+    # srcset and <picture> sources are current
+    generate_variants('logos')
+    print(f"✅ Logo size variants up to date: logos/{VARIANT_DIR}/")
+    formats = available_formats()
+    if formats:
+        generate_derivatives('logos', formats)
+        generate_derivatives(f'logos/{VARIANT_DIR}', formats)
+        print(f"✅ Logo derivatives up to date: {', '.join(formats)}")
+    
     # Read current HTML
     with open('index.html', 'r') as f:
         html_content = f.read()
@@ -434,6 +514,14 @@ def update_website_with_layout(layout_choice):
     if layout_choice == "ticker":
         new_html, new_css = implement_ticker_layout()
         layout_name = "Animated Ticker"
+    elif layout_choice == "ticker-atlas":
+        atlas = build_atlas()
+        new_html, new_css = implement_ticker_layout(atlas=atlas)
+        if atlas is None:
+            print("⚠️ Sprite atlas was not built; using the plain ticker with individual logo images")
+            layout_name = "Animated Ticker"
+        else:
+            layout_name = "Animated Ticker (sprite atlas)"
     elif layout_choice == "sectors":
         new_html, new_css = implement_sector_layout()
         layout_name = "Sector Categories"
@@ -481,17 +569,18 @@ def main():
     
     print("\nAvailable Layout Options:")
     print("1. ticker    - Animated scrolling ticker")
+    print("   ticker-atlas - Same ticker, all logos from one sprite image")
     print("2. sectors   - Organized by industry sectors")  
     print("3. spotlight - Featured premium clients")
     print("4. current   - Keep current masonry layout")
     
-    choice = input("\nEnter your choice (ticker/sectors/spotlight/current): ").lower().strip()
+    choice = input("\nEnter your choice (ticker/ticker-atlas/sectors/spotlight/current): ").lower().strip()
     
     if choice == "current":
         print("✅ Keeping current layout - no changes made")
         return
     
-    if choice in ["ticker", "sectors", "spotlight"]:
+    if choice in ["ticker", "ticker-atlas", "sectors", "spotlight"]:
         success = update_website_with_layout(choice)
         if success:
             print(f"\n🎉 Layout successfully updated!")
@@ -0,0 +1,111 @@
+"""
+Integral Image (Summed-Area Table)
+Answers rectangle sums over a sheet-sized plane in O(1) after a single O(n) pass
+"""
+
+import numpy as np
+
+
+class IntegralImage:
+    def __init__(self, values):
+        """
+        Build the summed-area table for a 2D plane
+
+        Args:
+            values (np.ndarray): 2D array to sum over, e.g. a boolean content
+                mask (sums are pixel counts) or a grayscale plane (sums are
+                total intensity)
+        """
+        values = np.asarray(values)
+        if values.ndim != 2:
+            raise ValueError(f"Expected a 2D plane, got shape {values.shape}")
+
+        self.height, self.width = values.shape
+
+        # 8-bit planes (masks, grayscale) fit in int32 unless the sheet is enormous
+        if values.dtype.itemsize == 1 and values.dtype.kind in 'bu':
+            max_value = 1 if values.dtype == np.bool_ else 255
+            fits = max_value * self.height * self.width < 2**31
+            dtype = np.int32 if fits else np.int64
+        else:
+            dtype = np.int64
+
+        # table[r, c] = sum of values[:r, :c]; the zero row/column removes edge cases
+        self.table = np.zeros((self.height + 1, self.width + 1), dtype=dtype)
+        inner = self.table[1:, 1:]
+        np.cumsum(values, axis=0, dtype=dtype, out=inner)
+        np.cumsum(inner, axis=1, out=inner)
+
+    def _clip(self, x, y, w, h):
+        x0 = min(max(x, 0), self.width)
+        y0 = min(max(y, 0), self.height)
+        x1 = min(max(x + w, 0), self.width)
+        y1 = min(max(y + h, 0), self.height)
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def rect_sum(self, x, y, w, h):
+        """
+        Sum of values inside (x, y, w, h); parts outside the plane count as 0
+        """
+        x0, y0, x1, y1 = self._clip(x, y, w, h)
+        t = self.table
+        return int(t[y1, x1] - t[y0, x1] - t[y1, x0] + t[y0, x0])
+
+    def rect_mean(self, x, y, w, h):
+        """
+        Mean over (x, y, w, h), treating pixels outside the plane as 0
+
+        This matches the zero padding PIL applies when cropping past the edge.
+        """
+        if w <= 0 or h <= 0:
+            return 0.0
+        return self.rect_sum(x, y, w, h) / (w * h)
+
+    def column_sums(self, y0=0, y1=None):
+        """
+        Per-column totals over rows [y0, y1) (vertical projection of a band)
+        """
+        y1 = self.height if y1 is None else y1
+        return np.diff(self.table[y1] - self.table[y0])
+
+    def row_sums(self, x0=0, x1=None):
+        """
+        Per-row totals over columns [x0, x1) (horizontal projection of a band)
+        """
+        x1 = self.width if x1 is None else x1
+        return np.diff(self.table[:, x1] - self.table[:, x0])
+
+    def content_bounds(self, x, y, w, h):
+        """
+        Tight bounds of nonzero values inside (x, y, w, h)
+
+        Returns (min_row, max_row, min_col, max_col) relative to the rectangle,
+        or None if it is empty. Cost is O(w + h) rather than O(w * h).
+        """
+        x0, y0, x1, y1 = self._clip(x, y, w, h)
+        t = self.table
+        rows = np.diff(t[y0:y1 + 1, x1] - t[y0:y1 + 1, x0])
+        cols = np.diff(t[y1, x0:x1 + 1] - t[y0, x0:x1 + 1])
+
+        filled_rows = np.flatnonzero(rows)
+        if len(filled_rows) == 0:
+            return None
+        filled_cols = np.flatnonzero(cols)
+
+        return (int(filled_rows[0]) + y0 - y, int(filled_rows[-1]) + y0 - y,
+                int(filled_cols[0]) + x0 - x, int(filled_cols[-1]) + x0 - x)
+
+    def border_means(self, x, y, w, h, border_size):
+        """
+        Mean value of the top, bottom, left and right border strips of a rectangle
+
+        Strips are clamped to the rectangle, like slicing region[:border_size].
+        """
+        bh = min(border_size, h)
+        bw = min(border_size, w)
+        return (
+            self.rect_mean(x, y, w, bh),
+            self.rect_mean(x, y + h - bh, w, bh),
+            self.rect_mean(x, y, bw, h),
+            self.rect_mean(x + w - bw, y, bw, h),
+        )
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Logo Atlas Builder
+Packs the mapped logos into one sprite sheet with a JSON/CSS offset map, so the ticker loads a single image
+"""
+
+import json
+import argparse
+from pathlib import Path
+
+from PIL import Image
+
+from logo_variants import DISPLAY_BOXES, MOBILE_QUERY, display_width
+from logo_derivatives import DERIVATIVE_FORMATS, available_formats, derivative_path, write_derivative
+
+ATLAS_DIR = "logos/atlas"
+ATLAS_NAME = "logo-atlas"
+ATLAS_DENSITY = 2  # Sprites are stored at 2x their CSS size for high-DPI screens
+ATLAS_PADDING = 2  # Transparent gap between sprites so filtering never bleeds
+
+
+def sprite_class(filename):
+    """
+    CSS class for a logo file: logo-nasa.png -> logo-sprite-logo-nasa
+    """
+    return f"logo-sprite-{Path(filename).stem}"
+
+
+def pack_shelves(sizes, width, padding=ATLAS_PADDING):
+    """
+    Shelf bin packing: items sorted by decreasing height fill rows left to right
+
+    Args:
+        sizes (list): (w, h) per item
+        width (int): Atlas width; must fit the widest item plus padding
+
+    Returns:
+        (positions, height): (x, y) per item in input order, and the atlas height
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+
+    for i in order:
+        w, h = sizes[i]
+        if x > 0 and x + w + padding > width:
+            y += shelf_height + padding
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+
+    return positions, y + shelf_height
+
+
+def pack_atlas(sizes, padding=ATLAS_PADDING):
+    """
+    Try every useful atlas width and keep the squarest packing
+
+    A near-square sheet keeps both dimensions well inside browser and GPU
+    texture limits; ties go to the smaller area. Returns (positions, (width, height)).
+    """
+    widest = max(w for w, _ in sizes)
+    total = sum(w + padding for w, _ in sizes)
+    best = None
+
+    for width in range(widest, total + 1, 8):
+        positions, height = pack_shelves(sizes, width, padding)
+        used_width = max(x + w for (x, _), (w, _) in zip(positions, sizes))
+        key = (max(used_width, height), used_width * height)
+        if best is None or key < best[0]:
+            best = (key, positions, (used_width, height))
+
+    return best[1], best[2]
+
+
+def _px(value):
+    """Compact CSS pixel value (no trailing zeros)"""
+    return f"{round(value, 3):g}px"
+
+
+def build_atlas(mapping_file="enhanced-logo-mapping-v2.json", logos_dir="logos",
+                output_dir=ATLAS_DIR, layout="ticker", density=ATLAS_DENSITY):
+    """
+    Pack every logo listed in the mapping into one sprite sheet
+
+    Each logo is resized to the layout's display box (logo_variants.DISPLAY_BOXES)
+    at the given density before packing. Writes <output_dir>/logo-atlas.png,
+    AVIF/WebP derivatives when smaller, logo-atlas.json (pixel offsets) and
+    logo-atlas.css (one class per logo, with the layout's mobile box if any).
+
+    Returns the offset map, or None if no mapped logo was found.
+    """
+    with open(mapping_file) as f:
+        logos = json.load(f)['logos']
+
+    boxes = DISPLAY_BOXES[layout]
+    logos_dir = Path(logos_dir)
+    output_dir = Path(output_dir)
+
+    sprites = []
+    missing = []
+    for logo in logos:
+        path = logos_dir / logo['filename']
+        if not path.exists():
+            missing.append(logo['filename'])
+            continue
+        with Image.open(path) as img:
+            natural = img.size
+            css_width = display_width(natural, boxes['default'])
+            css_height = css_width * natural[1] / natural[0]
+            width = min(natural[0], round(css_width * density))
+            height = max(1, round(natural[1] * width / natural[0]))
+            sprite = img.convert('RGBA').resize((width, height), Image.Resampling.LANCZOS)
+        sprites.append({'logo': logo, 'natural': natural, 'image': sprite,
+                        'css': (css_width, css_height)})
+
+    for filename in missing:
+        print(f"⚠️ Not in {logos_dir}/: {filename}")
+    if not sprites:
+        print("❌ No mapped logos found; atlas not built")
+        return None
+
+    positions, (atlas_width, atlas_height) = pack_atlas([s['image'].size for s in sprites])
+
+    atlas = Image.new('RGBA', (atlas_width, atlas_height), (0, 0, 0, 0))
+    for sprite, (x, y) in zip(sprites, positions):
+        atlas.paste(sprite['image'], (x, y))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    png_path = output_dir / f"{ATLAS_NAME}.png"
+    atlas.save(png_path, "PNG", optimize=True)
+    png_bytes = png_path.stat().st_size
+    formats = [fmt for fmt in available_formats()
+               if write_derivative(atlas, png_path, fmt, png_bytes) is not None]
+    # Drop derivatives left over from an earlier build that are now not smaller
+    for fmt in DERIVATIVE_FORMATS:
+        if fmt not in formats and derivative_path(png_path, fmt).exists():
+            derivative_path(png_path, fmt).unlink()
+
+    offset_map = {
+        "image": png_path.as_posix(),
+        "formats": formats,
+        "layout": layout,
+        "density": density,
+        "size": [atlas_width, atlas_height],
+        "sprites": {}
+    }
+    for sprite, (x, y) in zip(sprites, positions):
+        w, h = sprite['image'].size
+        offset_map["sprites"][sprite['logo']['filename']] = {
+            "class": sprite_class(sprite['logo']['filename']),
+            "x": x, "y": y, "width": w, "height": h,
+            "css_width": round(sprite['css'][0], 3),
+            "css_height": round(sprite['css'][1], 3),
+        }
+
+    with open(output_dir / f"{ATLAS_NAME}.json", 'w') as f:
+        json.dump(offset_map, f, indent=2)
+    with open(output_dir / f"{ATLAS_NAME}.css", 'w') as f:
+        f.write(atlas_css(offset_map, sprites))
+
+    print(f"✅ Packed {len(sprites)} logos into {png_path} ({atlas_width}x{atlas_height}, "
+          f"{png_bytes:,} bytes{', + ' + ', '.join(formats) if formats else ''})")
+    return offset_map
+
+
+def atlas_css(offset_map, sprites, indent=8):
+    """
+    CSS for the sprite classes: background-position per logo, scaled from
+    atlas pixels to CSS pixels (and again for the layout's mobile box)
+    """
+    pad = " " * indent
+    image = offset_map["image"]
+    atlas_width, atlas_height = offset_map["size"]
+    boxes = DISPLAY_BOXES[offset_map["layout"]]
+
+    # Modern formats through image-set(), with the PNG declared first as the fallback
+    background = f"{pad}    background-image: url({image});"
+    if offset_map["formats"]:
+        candidates = [f'url({derivative_path(image, fmt).as_posix()}) type("{DERIVATIVE_FORMATS[fmt]["mime"]}")'
+                      for fmt in offset_map["formats"]]
+        candidates.append(f'url({image}) type("image/png")')
+        background += f"\n{pad}    background-image: image-set({', '.join(candidates)});"
+
+    lines = [
+        f"{pad}/* Logo atlas sprites */",
+        f"{pad}.logo-sprite {{",
+        f"{pad}    display: inline-block;",
+        background,
+        f"{pad}    background-repeat: no-repeat;",
+        f"{pad}}}",
+    ]
+
+    def sprite_rules(entry, scale, inner=""):
+        # scale converts atlas pixels to CSS pixels for this sprite
+        return [
+            f"{pad}{inner}.{entry['class']} {{",
+            f"{pad}{inner}    width: {_px(entry['width'] * scale)};",
+            f"{pad}{inner}    height: {_px(entry['height'] * scale)};",
+            f"{pad}{inner}    background-size: {_px(atlas_width * scale)} {_px(atlas_height * scale)};",
+            f"{pad}{inner}    background-position: {_px(-entry['x'] * scale)} {_px(-entry['y'] * scale)};",
+            f"{pad}{inner}}}",
+        ]
+
+    entries = [offset_map["sprites"][s['logo']['filename']] for s in sprites]
+    for entry in entries:
+        lines.extend(sprite_rules(entry, entry['css_width'] / entry['width']))
+
+    if "mobile" in boxes:
+        lines.append(f"{pad}@media {MOBILE_QUERY} {{")
+        for sprite, entry in zip(sprites, entries):
+            mobile_width = display_width(sprite['natural'], boxes['mobile'])
+            lines.extend(sprite_rules(entry, mobile_width / entry['width'], inner="    "))
+        lines.append(f"{pad}}}")
+
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack mapped logos into a sprite atlas")
+    parser.add_argument("--mapping", default="enhanced-logo-mapping-v2.json", help="Logo mapping JSON")
+    parser.add_argument("--logos", default="logos", help="Folder holding the mapped PNGs")
+    parser.add_argument("--output", default=ATLAS_DIR, help=f"Atlas folder (default: {ATLAS_DIR})")
+    parser.add_argument("--density", type=int, default=ATLAS_DENSITY, help="Sprite pixels per CSS pixel")
+    args = parser.parse_args()
+
+    build_atlas(args.mapping, args.logos, args.output, density=args.density)
@@ -1,13 +1,24 @@
 #!/usr/bin/env python3
 """
 Logo Color Converter
-Converts logos to black and white versions while preserving transparency
+Converts logos to black, white and other single-color versions while preserving transparency
 """
 
 import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 import numpy as np
 
+from png_encoding import save_png
+from crop_pipeline import DEFAULT_ENCODE_WORKERS
+from derivative_store import DerivativeStore, publish, STORE_DIRNAME
+
 def convert_to_black(image_path, output_path):
     """Convert logo to black version - converts all non-transparent pixels to black"""
     with Image.open(image_path) as img:
@@ -58,42 +69,289 @@ def convert_to_white(image_path, output_path):
         white_img = Image.fromarray(white_data, 'RGBA')
         white_img.save(output_path, 'PNG')
 
-def process_logos(input_dir, output_dir):
-    """Process all PNG files in input directory"""
+# Tint colors for logo variants; navy and grey are the site's --primary-navy and --accent-gray
+TINTS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "navy": (0x1e, 0x3a, 0x5f),
+    "grey": (0x6c, 0x75, 0x7d),
+}
+DEFAULT_VARIANTS = ("black", "white")
+TINT_ENGINES = ("where", "merge", "index")
+DEFAULT_TINT_ENGINE = "where"
+# Derivative store operation name for tint variants (params: color, engine)
+TINT_OPERATION = "logo_color_converter.tint"
+
+def parse_variant(spec):
+    """
+    Variant name -> (name, (r, g, b)); a name from TINTS or name=#rrggbb
+    """
+    name, _, color = spec.partition('=')
+    if not color:
+        if name not in TINTS:
+            raise ValueError(f"Unknown variant '{name}', expected one of {tuple(TINTS)} or name=#rrggbb")
+        return name, TINTS[name]
+    color = color.lstrip('#')
+    if len(color) != 6:
+        raise ValueError(f"Expected a #rrggbb color in '{spec}'")
+    return name, tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+def _pack(rgba):
+    """One RGBA pixel as the uint32 a packed view of the image would hold"""
+    return np.array(rgba, dtype=np.uint8).view(np.uint32)[0]
+
+def tint_images(data, variants, engine=DEFAULT_TINT_ENGINE):
+    """
+    Tinted RGBA images of one decoded RGBA array, one per (name, (r, g, b))
+    
+    Engines:
+        where: one np.where per variant over the pixels packed as uint32,
+               against a mask and alpha bits built once per logo; per
+               variant only the output (and one packed temporary) is allocated
+        merge: constant R/G/B bands merged with the original alpha band;
+               fully transparent pixels take the tint too (invisible, and
+               the PNGs usually get smaller)
+        index: masked assignment into a copy of the logo (the reference)
+    where and index produce identical images.
+    """
+    if engine not in TINT_ENGINES:
+        raise ValueError(f"Unknown tint engine '{engine}', expected one of {TINT_ENGINES}")
+    
+    if engine == "merge":
+        size = (data.shape[1], data.shape[0])
+        alpha = Image.fromarray(np.ascontiguousarray(data[:, :, 3]), 'L')
+        return [(name, Image.merge('RGBA', [Image.new('L', size, c) for c in color] + [alpha]))
+                for name, color in variants]
+    
+    mask = data[:, :, 3] > 0  # Non-transparent pixels
+    if engine == "where":
+        # One uint32 per RGBA pixel; packing the constants through the same
+        # uint8 -> uint32 view keeps this independent of byte order
+        pixels = np.ascontiguousarray(data).view(np.uint32)[:, :, 0]
+        alpha_bits = pixels & _pack((0, 0, 0, 255))
+        results = []
+        for name, color in variants:
+            tinted = np.where(mask, alpha_bits | _pack((*color, 0)), pixels)
+            results.append((name, Image.fromarray(tinted.view(np.uint8).reshape(data.shape), 'RGBA')))
+        return results
+    
+    results = []
+    for name, color in variants:
+        tinted = data.copy()
+        tinted[mask, :3] = color
+        results.append((name, Image.fromarray(tinted, 'RGBA')))
+    return results
+
+def tint_variants(image_path, variants, engine=DEFAULT_TINT_ENGINE):
+    """
+    Decode a logo once and tint every non-transparent pixel per variant
+    
+    variants: list of (name, (r, g, b)). Returns [(name, PIL image)] with
+    the original alpha kept; see tint_images for the engines.
+    """
+    with Image.open(image_path) as img:
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        data = np.array(img)
+    return tint_images(data, variants, engine)
+
+def benchmark_tinting(directory="logos", variants=DEFAULT_VARIANTS):
+    """
+    Time and peak memory of each tint engine against convert_to_black /
+    convert_to_white on every PNG in a directory (outputs go to a temp folder)
+    
+    End to end covers decode, tint and PNG encode; tint-only runs on
+    pre-decoded logos. where/index must match the current converter exactly;
+    merge must match wherever alpha > 0. Peak memory is what tracemalloc
+    sees: NumPy arrays, not Pillow's own image buffers.
+    """
+    variants = [parse_variant(v) if isinstance(v, str) else v for v in variants]
+    paths = sorted(p for p in glob.glob(os.path.join(directory, "*.png")) if os.path.isfile(p))
+    if not paths:
+        print(f"No PNG files in {directory}")
+        return
+    
+    def measure(run):
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return seconds, peak
+    
+    out_dir = tempfile.mkdtemp(prefix="tint-bench-")
+    try:
+        current = {"black": convert_to_black, "white": convert_to_white}
+        names = [name for name, _ in variants if name in current]
+        
+        def run_current():
+            for path in paths:
+                for name in names:
+                    current[name](path, os.path.join(out_dir, f"current-{name}-{os.path.basename(path)}"))
+        
+        print(f"Tinting {len(paths)} logos from {directory} to {', '.join(name for name, _ in variants)}")
+        if names:
+            seconds, peak = measure(run_current)
+            print(f"  {'current':8s} end to end {seconds:6.2f}s  peak {peak / 2**20:6.1f} MiB  ({', '.join(names)} only)")
+        
+        decoded = []
+        for path in paths:
+            with Image.open(path) as img:
+                decoded.append(np.array(img.convert('RGBA')))
+        
+        for engine in TINT_ENGINES:
+            sizes = []
+            mismatches = set()
+            
+            def run_engine():
+                for path in paths:
+                    for name, image in tint_variants(path, variants, engine):
+                        out_path = os.path.join(out_dir, f"{engine}-{name}-{os.path.basename(path)}")
+                        save_png(image, out_path)
+                        sizes.append(os.path.getsize(out_path))
+            
+            seconds, peak = measure(run_engine)
+            
+            def run_tint_only():
+                for data in decoded:
+                    tint_images(data, variants, engine)
+            
+            tint_seconds, tint_peak = measure(run_tint_only)
+            
+            for path in paths:
+                for name in names:
+                    with Image.open(os.path.join(out_dir, f"current-{name}-{os.path.basename(path)}")) as ref, \
+                            Image.open(os.path.join(out_dir, f"{engine}-{name}-{os.path.basename(path)}")) as out:
+                        expected, actual = np.asarray(ref), np.asarray(out)
+                    if engine == "merge":
+                        visible = expected[:, :, 3] > 0
+                        same = np.array_equal(expected[visible], actual[visible]) and \
+                            np.array_equal(expected[:, :, 3], actual[:, :, 3])
+                    else:
+                        same = np.array_equal(expected, actual)
+                    if not same:
+                        mismatches.add(os.path.basename(path))
+            
+            check = "" if not names else (f"  ❌ differs: {', '.join(sorted(mismatches))}" if mismatches else "  ✅ matches")
+            print(f"  {engine:8s} end to end {seconds:6.2f}s  peak {peak / 2**20:6.1f} MiB  | "
+                  f"tint only {tint_seconds * 1000:6.1f}ms  peak {tint_peak / 2**20:6.1f} MiB  | "
+                  f"{sum(sizes):,} bytes{check}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def variant_output_path(output_dir, filename, name):
+    """
+    <output_dir>/<name>-versions/<logo>-<name>.png, as for the black and white versions
+    """
+    return os.path.join(output_dir, f"{name}-versions", filename.replace('.png', f'-{name}.png'))
+
+def _store_variant(store, source_hash, params, image, output_path):
+    """
+    Encode a new variant into the store, then copy it to its output path
+    """
+    result_path = store.put(source_hash, TINT_OPERATION, params, lambda tmp: save_png(image, tmp))
+    return publish(result_path, output_path)
+
+def process_logos(input_dir, output_dir, variants=DEFAULT_VARIANTS, workers=DEFAULT_ENCODE_WORKERS,
+                  engine=DEFAULT_TINT_ENGINE, store_dir=None):
+    """
+    Process all PNG files in input directory
+    
+    Each logo is decoded once and every variant (names from TINTS, or
+    name=#rrggbb) is derived from it with the given tint engine; the PNG
+    writes run on a thread pool. With store_dir, variants go through a
+    DerivativeStore keyed by source hash, tint and engine: a logo is only
+    decoded when one of its variants is missing from the store, and outputs
+    are only rewritten when their bytes change.
+    """
+    variants = [parse_variant(v) if isinstance(v, str) else v for v in variants]
+    store = DerivativeStore(store_dir) if store_dir else None
     
     # Create output directories
-    black_dir = os.path.join(output_dir, 'black-versions')
-    white_dir = os.path.join(output_dir, 'white-versions')
-    os.makedirs(black_dir, exist_ok=True)
-    os.makedirs(white_dir, exist_ok=True)
-    
-    # Process each PNG file
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.png'):
+    for name, _ in variants:
+        os.makedirs(os.path.join(output_dir, f"{name}-versions"), exist_ok=True)
+    
+    pending = set()
+    statuses = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Process each PNG file
+        for filename in sorted(os.listdir(input_dir)):
+            if not filename.lower().endswith('.png'):
+                continue
             input_path = os.path.join(input_dir, filename)
             
-            # Create black version
-            black_filename = filename.replace('.png', '-black.png')
-            black_output = os.path.join(black_dir, black_filename)
-            convert_to_black(input_path, black_output)
-            print(f"Created black version: {black_filename}")
+            # Keep decoded logos from piling up ahead of the encoders
+            while len(pending) >= 2 * max(1, workers):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    statuses.append(future.result())
+            
+            if store is None:
+                for name, image in tint_variants(input_path, variants, engine):
+                    output_path = variant_output_path(output_dir, filename, name)
+                    pending.add(pool.submit(save_png, image, output_path))
+                    print(f"Created {name} version: {os.path.basename(output_path)}")
+                continue
+            
+            source_hash = store.add_source(input_path)
+            missing = []
+            for name, color in variants:
+                params = {"color": list(color), "engine": engine}
+                output_path = variant_output_path(output_dir, filename, name)
+                result_path = store.result_path(source_hash, TINT_OPERATION, params)
+                if os.path.exists(result_path):
+                    pending.add(pool.submit(publish, result_path, output_path))
+                else:
+                    missing.append((name, color, params, output_path))
             
-            # Create white version  
-            white_filename = filename.replace('.png', '-white.png')
-            white_output = os.path.join(white_dir, white_filename)
-            convert_to_white(input_path, white_output)
-            print(f"Created white version: {white_filename}")
+            if missing:
+                images = tint_variants(input_path, [(name, color) for name, color, _, _ in missing], engine)
+                for (name, _, params, output_path), (_, image) in zip(missing, images):
+                    pending.add(pool.submit(_store_variant, store, source_hash, params, image, output_path))
+                    print(f"Created {name} version: {os.path.basename(output_path)}")
+        
+        for future in pending:
+            statuses.append(future.result())
+    
+    if store is not None:
+        unchanged = statuses.count("unchanged")
+        print(f"{len(statuses) - unchanged} variant files written, {unchanged} already up to date")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create single-color versions of logos, keeping transparency")
+    parser.add_argument("--input", default=os.path.expanduser("~/Downloads/granalytic-logos"),
+                        help="Folder of logos (default: ~/Downloads/granalytic-logos)")
+    parser.add_argument("--output", help="Where the <variant>-versions folders go (default: the input folder)")
+    parser.add_argument("--variants", nargs="+", default=list(DEFAULT_VARIANTS),
+                        help=f"Variants to create: {', '.join(TINTS)} or name=#rrggbb (default: black white)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_ENCODE_WORKERS, help="Parallel PNG writes")
+    parser.add_argument("--engine", default=DEFAULT_TINT_ENGINE, choices=TINT_ENGINES,
+                        help=f"Tinting engine (default: {DEFAULT_TINT_ENGINE})")
+    parser.add_argument("--no-store", action="store_true",
+                        help=f"Skip the derivative store (INPUT/{STORE_DIRNAME}) and always re-tint")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the tint engines with the current converter on logos/ (or --input)")
+    args = parser.parse_args()
+    try:
+        variants = [parse_variant(v) for v in args.variants]
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.benchmark:
+        benchmark_tinting(args.input if args.input != parser.get_default("input") else "logos", variants)
+        raise SystemExit
+    
     # Set paths
-    input_directory = os.path.expanduser("~/Downloads/granalytic-logos")
-    output_directory = os.path.expanduser("~/Downloads/granalytic-logos")
+    input_directory = args.input
+    output_directory = args.output or input_directory
     
-    print("Converting logos to black and white versions...")
+    print(f"Converting logos to {', '.join(name for name, _ in variants)} versions...")
     print(f"Input directory: {input_directory}")
     print(f"Output directory: {output_directory}")
     
-    process_logos(input_directory, output_directory)
+    store_dir = None if args.no_store else os.path.join(input_directory, STORE_DIRNAME)
+    process_logos(input_directory, output_directory, variants, args.workers, args.engine, store_dir)
     print("\nConversion complete!")
-    print("Black versions saved to: ~/Downloads/granalytic-logos/black-versions/")
-    print("White versions saved to: ~/Downloads/granalytic-logos/white-versions/")
\ No newline at end of file
+    for name, _ in variants:
+        print(f"{name.capitalize()} versions saved to: {os.path.join(output_directory, name + '-versions')}/")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Logo Derivatives
+Writes AVIF and WebP versions next to each PNG in logos/ so the layouts can serve them through <picture>
+"""
+
+import os
+import argparse
+from pathlib import Path
+
+from PIL import Image, features
+
+# In <picture> order: browsers take the first source type they support
+DERIVATIVE_FORMATS = {
+    "avif": {"format": "AVIF", "mime": "image/avif", "options": {"quality": 70}},
+    "webp": {"format": "WEBP", "mime": "image/webp", "options": {"quality": 90, "method": 6}},
+}
+
+
+def available_formats():
+    """
+    Derivative formats this Pillow build can encode
+    """
+    return [name for name in DERIVATIVE_FORMATS if features.check(name)]
+
+
+def derivative_path(png_path, fmt):
+    """
+    logos/logo-nasa.png -> logos/logo-nasa.<fmt>
+    """
+    return Path(png_path).with_suffix(f".{fmt}")
+
+
+def derivative_sources(png_path):
+    """
+    (mime type, path) for every derivative present next to a PNG, in <picture> order
+    """
+    sources = []
+    for fmt, spec in DERIVATIVE_FORMATS.items():
+        path = derivative_path(png_path, fmt)
+        if path.exists():
+            sources.append((spec["mime"], path))
+    return sources
+
+
+def write_derivative(image, png_path, fmt, png_bytes):
+    """
+    Encode one derivative of an image saved at png_path
+
+    The derivative is only kept if it is smaller than the PNG (png_bytes);
+    returns its size, or None when it was not kept.
+    """
+    spec = DERIVATIVE_FORMATS[fmt]
+    out_path = derivative_path(png_path, fmt)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    image.save(tmp_path, spec["format"], **spec["options"])
+    if tmp_path.stat().st_size < png_bytes:
+        os.replace(tmp_path, out_path)
+        return out_path.stat().st_size
+    tmp_path.unlink()
+    if out_path.exists():
+        out_path.unlink()
+    return None
+
+
+def generate_derivatives(directory="logos", formats=None, force=False):
+    """
+    Encode every PNG in a directory to the derivative formats
+
+    A derivative is only rewritten when its PNG is newer (or with force).
+    Derivatives that would not be smaller than the PNG are not kept, so
+    <picture> never points the browser at a larger file.
+
+    Returns {png name: {fmt: bytes or None}}.
+    """
+    directory = Path(directory)
+    formats = available_formats() if formats is None else formats
+    report = {}
+
+    for png_path in sorted(directory.glob("*.png")):
+        png_bytes = png_path.stat().st_size
+        png_mtime = png_path.stat().st_mtime_ns
+        image = None
+        report[png_path.name] = {}
+
+        for fmt in formats:
+            out_path = derivative_path(png_path, fmt)
+
+            if not force and out_path.exists() and out_path.stat().st_mtime_ns >= png_mtime:
+                report[png_path.name][fmt] = out_path.stat().st_size
+                continue
+
+            if image is None:
+                image = Image.open(png_path)
+                image.load()
+
+            report[png_path.name][fmt] = write_derivative(image, png_path, fmt, png_bytes)
+
+        if image is not None:
+            image.close()
+
+    return report
+
+
+def print_report(directory, report):
+    """
+    Print per-logo derivative sizes against the PNG
+    """
+    directory = Path(directory)
+    totals = {}
+    png_total = 0
+    for name, sizes in report.items():
+        png_bytes = (directory / name).stat().st_size
+        png_total += png_bytes
+        parts = []
+        for fmt, size in sizes.items():
+            if size is None:
+                parts.append(f"{fmt} skipped (not smaller)")
+                totals[fmt] = totals.get(fmt, 0) + png_bytes
+            else:
+                parts.append(f"{fmt} {size:,} ({100 * size / png_bytes:.0f}%)")
+                totals[fmt] = totals.get(fmt, 0) + size
+        print(f"  {name}: png {png_bytes:,} → " + ", ".join(parts))
+
+    for fmt, total in totals.items():
+        print(f"  Total {fmt}: {png_total:,} → {total:,} bytes ({100 * total / png_total:.0f}% of PNG)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate AVIF/WebP derivatives for logo PNGs")
+    parser.add_argument("directory", nargs="?", default="logos", help="Folder of PNGs (default: logos)")
+    parser.add_argument("--formats", nargs="+", choices=tuple(DERIVATIVE_FORMATS),
+                        help="Formats to write (default: every format Pillow supports)")
+    parser.add_argument("--force", action="store_true", help="Re-encode even if derivatives are up to date")
+    args = parser.parse_args()
+
+    print(f"🖼️ Generating derivatives in {args.directory}/")
+    report = generate_derivatives(args.directory, args.formats, args.force)
+    print_report(args.directory, report)
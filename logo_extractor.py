@@ -6,42 +6,67 @@ Analyzes an image with multiple logos and extracts each one into separate PNG fi
 
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
 import os
+import sys
 import json
+import glob
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from image_loader import load_sheet
+from integral_image import IntegralImage
+from box_index import suppress_overlapping_boxes
+from tiled_detection import strip_mask_builder, find_external_contours
+from crop_pipeline import CropWriter
+from png_encoding import ENCODE_PROFILES, DEFAULT_PROFILE
 
 class LogoExtractor:
-    def __init__(self, image_path, output_dir="extracted_logos"):
+    def __init__(self, image, output_dir="extracted_logos", png_profile=DEFAULT_PROFILE,
+                 png_report=False):
         """
         Initialize the LogoExtractor
         
         Args:
-            image_path (str): Path to the input image
+            image (SheetImage or str): Decoded sheet, or path to the input image
             output_dir (str): Directory to save extracted logos
+            png_profile (str): PNG encode profile (see png_encoding.ENCODE_PROFILES)
+            png_report (bool): Also report bytes saved per logo against the default encode
         """
-        self.image_path = image_path
+        self.sheet = load_sheet(image)
+        self.image_path = self.sheet.path
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.png_profile = png_profile
+        self.png_report = png_report
         
-        # Load image
-        self.image = cv2.imread(image_path)
-        self.pil_image = Image.open(image_path)
-        self.height, self.width = self.image.shape[:2]
+        # All views share the sheet's single decoded buffer
+        self.pil_image = self.sheet.pil
+        self.width, self.height = self.sheet.size
         
         # Logo detection parameters
         self.min_logo_area = 5000  # Minimum area for a logo
         self.max_logo_area = self.width * self.height * 0.3  # Max 30% of image
         self.padding = 20  # Padding around detected logos
+        self.duplicate_iou = 0.5  # Boxes overlapping more than this are the same logo
         
-    def detect_logos_contours(self):
+        # Summed-area table of non-white pixels, built on first use
+        self._content_table = None
+        
+    def content_table(self):
         """
-        Detect logos using contour detection method
-        Returns list of bounding boxes (x, y, w, h)
+        Integral image of the non-white mask (gray < 250), computed once per sheet
+        """
+        if self._content_table is None:
+            self._content_table = IntegralImage(self.sheet.gray < 250)
+        return self._content_table
+    
+    def _content_mask(self, gray):
+        """
+        Binary mask of logo content used by contour detection
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        
         # Apply threshold to get binary image
         _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
         
@@ -49,9 +74,27 @@ class LogoExtractor:
         kernel = np.ones((3,3), np.uint8)
         binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
         binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+        return binary
+    
+    def detect_logos_contours(self, tiled=False, strip_height=1024):
+        """
+        Detect logos using contour detection method
+        Returns list of bounding boxes (x, y, w, h)
         
-        # Find contours
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        Args:
+            tiled (bool): Build the mask in horizontal strips for bounded memory;
+                returns the same boxes as the full-image path
+            strip_height (int): Rows per strip in tiled mode
+        """
+        if tiled:
+            # Close + open with 3x3 kernels reach 4 rows; 8 leaves margin
+            mask_rows = strip_mask_builder(self.sheet.gray_rows, self.height, self._content_mask, halo=8)
+            contours = find_external_contours(mask_rows, self.height, strip_height)
+        else:
+            binary = self._content_mask(self.sheet.gray)
+            
+            # Find contours
+            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         logo_boxes = []
         for contour in contours:
@@ -67,20 +110,32 @@ class LogoExtractor:
         
         return logo_boxes
     
-    def detect_logos_grid(self):
+    def detect_logos_grid(self, tiled=False, strip_height=1024):
         """
         Detect logos assuming they're arranged in a rough grid
         Uses adaptive approach based on whitespace detection
-        """
-        # Convert to grayscale
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
         
-        # Create binary mask (non-white areas)
-        mask = gray < 250
-        
-        # Find horizontal and vertical projections
-        h_projection = np.sum(mask, axis=1)  # Sum across width
-        v_projection = np.sum(mask, axis=0)  # Sum across height
+        Args:
+            tiled (bool): Build the projections strip by strip and each row's
+                from its own band, instead of a sheet-sized summed-area table;
+                returns the same boxes
+            strip_height (int): Rows per strip in tiled mode
+        """
+        if tiled:
+            table = None
+            h_projection = np.zeros(self.height, dtype=np.int64)
+            v_projection = np.zeros(self.width, dtype=np.int64)
+            for y0 in range(0, self.height, strip_height):
+                y1 = min(self.height, y0 + strip_height)
+                strip = self.sheet.gray_rows(y0, y1) < 250
+                h_projection[y0:y1] = strip.sum(axis=1)
+                v_projection += strip.sum(axis=0)
+        else:
+            table = self.content_table()
+            
+            # Find horizontal and vertical projections
+            h_projection = table.row_sums()  # Sum across width
+            v_projection = table.column_sums()  # Sum across height
         
         # Find row boundaries (areas with low horizontal projection)
         row_boundaries = self.find_boundaries(h_projection, min_gap=30)
@@ -93,9 +148,12 @@ class LogoExtractor:
             row_start = row_boundaries[i]
             row_end = row_boundaries[i + 1]
             
-            # Get the row slice
-            row_mask = mask[row_start:row_end, :]
-            row_v_projection = np.sum(row_mask, axis=0)
+            # Column projection of this row band
+            if tiled:
+                band = self.sheet.gray_rows(row_start, row_end) < 250
+                row_v_projection = band.sum(axis=0)
+            else:
+                row_v_projection = table.column_sums(row_start, row_end)
             
             # Find logo boundaries in this row
             logo_boundaries = self.find_boundaries(row_v_projection, min_gap=30)
@@ -104,9 +162,12 @@ class LogoExtractor:
                 col_start = logo_boundaries[j] 
                 col_end = logo_boundaries[j + 1]
                 
-                # Check if this region has significant content
-                region_mask = mask[row_start:row_end, col_start:col_end]
-                if np.sum(region_mask) > 1000:  # Minimum content threshold
+                # Check if this region has significant content (O(1) lookup)
+                if tiled:
+                    content = int(row_v_projection[col_start:col_end].sum())
+                else:
+                    content = table.rect_sum(col_start, row_start, col_end - col_start, row_end - row_start)
+                if content > 1000:  # Minimum content threshold
                     # Add padding
                     x = max(0, col_start - self.padding)
                     y = max(0, row_start - self.padding)
@@ -120,6 +181,18 @@ class LogoExtractor:
     def find_boundaries(self, projection, min_gap=20):
         """
         Find boundaries in projection where gaps occur
+        
+        Vectorized: a boundary is every index where a low run (< min_gap)
+        ends, i.e. a low -> high transition in the thresholded mask.
+        Returns the same list as find_boundaries_loop.
+        """
+        low = np.asarray(projection) < min_gap
+        gap_ends = np.flatnonzero(low[:-1] & ~low[1:]) + 1
+        return [0] + gap_ends.tolist() + [len(low)]
+    
+    def find_boundaries_loop(self, projection, min_gap=20):
+        """
+        Reference implementation of find_boundaries (element-by-element loop)
         """
         boundaries = [0]
         in_gap = projection[0] < min_gap
@@ -185,43 +258,56 @@ class LogoExtractor:
         
         return coordinates
     
-    def extract_logos(self, method="auto"):
+    def extract_logos(self, method="auto", tiled=False):
         """
         Extract logos using specified method
         
         Args:
             method (str): "auto", "contours", "grid", or "manual"
+            tiled (bool): Run detection strip by strip, never holding a
+                sheet-sized mask or table (same boxes, for very large sheets)
         """
         print(f"Extracting logos using {method} method...")
         
+        duplicates_removed = 0
         if method == "manual":
             logo_boxes = self.manual_coordinates()
         elif method == "contours":
-            logo_boxes = self.detect_logos_contours()
+            logo_boxes = self.detect_logos_contours(tiled=tiled)
         elif method == "grid":
-            logo_boxes = self.detect_logos_grid()
+            logo_boxes = self.detect_logos_grid(tiled=tiled)
         else:  # auto - try multiple methods
-            logo_boxes = self.detect_logos_grid()
+            logo_boxes = self.detect_logos_grid(tiled=tiled)
             if len(logo_boxes) < 10:  # If we didn't find enough logos
                 print("Grid method found few logos, trying contours...")
-                contour_boxes = self.detect_logos_contours()
+                contour_boxes = self.detect_logos_contours(tiled=tiled)
                 logo_boxes.extend(contour_boxes)
+                
+                # Grid boxes come first, so they win over overlapping contour boxes
+                logo_boxes, duplicates_removed = suppress_overlapping_boxes(
+                    logo_boxes, iou_threshold=self.duplicate_iou)
+                print(f"Removed {duplicates_removed} redundant crops")
         
         print(f"Found {len(logo_boxes)} potential logos")
         
-        # Extract and save each logo
-        logo_info = []
-        for i, (x, y, w, h) in enumerate(logo_boxes):
-            try:
-                # Extract logo region
-                logo_region = self.pil_image.crop((x, y, x + w, y + h))
-                
+        # Extract and save each logo; crops are views of the sheet and the
+        # PNG encodes overlap on a thread pool
+        writes = []
+        with CropWriter(self.sheet, raise_errors=False, profile=self.png_profile,
+                        compare=self.png_report) as writer:
+            for i, (x, y, w, h) in enumerate(logo_boxes):
                 # Generate filename
                 filename = f"logo_{i+1:02d}.png"
                 filepath = self.output_dir / filename
-                
-                # Save logo
-                logo_region.save(filepath, "PNG")
+                try:
+                    writes.append((i, filename, (x, y, w, h), writer.submit(x, y, w, h, filepath)))
+                except Exception as e:
+                    print(f"Error extracting logo {i+1}: {e}")
+        
+        logo_info = []
+        for i, filename, (x, y, w, h), future in writes:
+            try:
+                future.result()
                 print(f"Saved: {filename} ({w}x{h} at {x},{y})")
                 
                 logo_info.append({
@@ -232,6 +318,7 @@ class LogoExtractor:
                 
             except Exception as e:
                 print(f"Error extracting logo {i+1}: {e}")
+        writer.print_savings()
         
         # Save extraction info
         info_file = self.output_dir / "extraction_info.json"
@@ -240,6 +327,7 @@ class LogoExtractor:
                 "source_image": self.image_path,
                 "method": method,
                 "total_logos": len(logo_info),
+                "duplicates_removed": duplicates_removed,
                 "logos": logo_info
             }, f, indent=2)
         
@@ -261,10 +349,166 @@ class LogoExtractor:
         preview_image.save(output_file)
         print(f"Preview saved: {output_file}")
 
+def benchmark_find_boundaries(image_path="client-logos-collection.png", repeats=20):
+    """
+    Check find_boundaries against the loop version and time both
+    
+    Equivalence is asserted on the sheet's real projections plus random
+    projections of varying length, including all-low and all-high edge cases.
+    """
+    extractor = LogoExtractor(image_path, output_dir=tempfile.mkdtemp())
+    table = extractor.content_table()
+    
+    rng = np.random.default_rng(42)
+    cases = [
+        (table.row_sums(), 30),
+        (table.column_sums(), 50),
+        (np.zeros(100, dtype=int), 20),
+        (np.full(100, 100), 20),
+        (np.array([5]), 20),
+        (np.array([50]), 20),
+    ]
+    for length in (2, 3, 17, 1000, 20000):
+        cases.append((rng.integers(0, 60, size=length), 30))
+    
+    for projection, min_gap in cases:
+        expected = extractor.find_boundaries_loop(projection, min_gap)
+        actual = extractor.find_boundaries(projection, min_gap)
+        assert actual == expected, f"Mismatch for length {len(projection)}, min_gap {min_gap}"
+    print(f"✅ find_boundaries matches loop version on {len(cases)} projections")
+    
+    # Tall, high-DPI sheet: tile the real row projection
+    tall = np.tile(table.row_sums(), 20)
+    timings = {}
+    for name, func in (("loop", extractor.find_boundaries_loop), ("vectorized", extractor.find_boundaries)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            func(tall, 30)
+        timings[name] = (time.perf_counter() - start) / repeats
+    
+    print(f"Projection length: {len(tall)}")
+    print(f"  loop:       {timings['loop'] * 1000:.3f} ms")
+    print(f"  vectorized: {timings['vectorized'] * 1000:.3f} ms")
+    print(f"  speedup:    {timings['loop'] / timings['vectorized']:.1f}x")
+    return timings
+
+def find_sheets(source):
+    """
+    Resolve a directory or glob pattern to a sorted list of sheet images
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "*.png")
+    else:
+        pattern = source
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+def extract_sheet(image_path, output_dir, method="auto", png_profile=DEFAULT_PROFILE, png_report=False,
+                  tiled=False):
+    """
+    Extract one sheet into its own folder (process pool worker)
+    """
+    start = time.perf_counter()
+    try:
+        extractor = LogoExtractor(image_path, output_dir, png_profile=png_profile, png_report=png_report)
+        logo_info = extractor.extract_logos(method=method, tiled=tiled)
+        error = None
+    except Exception as e:
+        logo_info = []
+        error = str(e)
+    
+    return {
+        "source_image": image_path,
+        "output_dir": str(output_dir),
+        "total_logos": len(logo_info),
+        "seconds": round(time.perf_counter() - start, 3),
+        "error": error
+    }
+
+def batch_extract(source, output_root="extracted_logos", method="auto", workers=None,
+                  png_profile=DEFAULT_PROFILE, png_report=False, tiled=False):
+    """
+    Run extract_logos over every sheet in a directory or glob using a process pool
+    
+    Each sheet gets output_root/<sheet name>/ with its own extraction_info.json,
+    and a combined batch_summary.json is written to output_root.
+    """
+    sheets = find_sheets(source)
+    if not sheets:
+        print(f"Error: No sheets found for '{source}'")
+        return None
+    
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    
+    print(f"Batch extracting {len(sheets)} sheets with {workers or os.cpu_count()} workers...")
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(extract_sheet, sheet, str(output_root / Path(sheet).stem), method, png_profile,
+                        png_report, tiled)
+            for sheet in sheets
+        ]
+        results = [future.result() for future in futures]
+    
+    summary = {
+        "source": source,
+        "method": method,
+        "total_sheets": len(results),
+        "failed_sheets": sum(1 for r in results if r["error"]),
+        "total_logos": sum(r["total_logos"] for r in results),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "sheets": results
+    }
+    
+    with open(output_root / "batch_summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    
+    print(f"\n📊 Batch Summary:")
+    for r in results:
+        status = f"❌ {r['error']}" if r["error"] else f"✅ {r['total_logos']} logos"
+        print(f"  {Path(r['source_image']).name}: {status} ({r['seconds']:.2f}s)")
+    print(f"Sheets: {summary['total_sheets']} ({summary['failed_sheets']} failed)")
+    print(f"Logos: {summary['total_logos']}")
+    print(f"Wall time: {summary['wall_seconds']:.2f}s")
+    print(f"Summary saved: {output_root / 'batch_summary.json'}")
+    
+    return summary
+
 def main():
     """
     Main function to run logo extraction
     """
+    parser = argparse.ArgumentParser(description="Extract logos from collection sheets")
+    parser.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="Extract every sheet in a directory or glob pattern")
+    parser.add_argument("--output", default="extracted_logos",
+                        help="Output folder (batch mode writes one subfolder per sheet)")
+    parser.add_argument("--method", default="auto", choices=["auto", "contours", "grid", "manual"],
+                        help="Detection method for batch mode")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for batch mode (default: CPU count)")
+    parser.add_argument("--png-profile", default=DEFAULT_PROFILE, choices=tuple(ENCODE_PROFILES),
+                        help="PNG encode profile: fast for tuning runs, max or palette for publishing")
+    parser.add_argument("--png-report", action="store_true",
+                        help="Also encode each logo with the default profile and report bytes saved (slower)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Detect strip by strip with bounded memory, for very large sheets")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Verify and time the vectorized find_boundaries")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        benchmark_find_boundaries()
+        return
+    
+    if args.batch:
+        summary = batch_extract(args.batch, args.output, args.method, args.workers, args.png_profile,
+                                args.png_report, args.tiled)
+        if summary is None or summary["failed_sheets"]:
+            sys.exit(1)
+        return
+    
     image_path = "client-logos-collection.png"
     
     if not os.path.exists(image_path):
@@ -272,15 +516,16 @@ def main():
         return
     
     # Create extractor
-    extractor = LogoExtractor(image_path)
+    extractor = LogoExtractor(image_path, args.output, png_profile=args.png_profile,
+                              png_report=args.png_report)
     
     # Try manual method first (most accurate for this specific image)
     print("Attempting manual coordinate extraction...")
-    logo_info = extractor.extract_logos(method="manual")
+    logo_info = extractor.extract_logos(method="manual", tiled=args.tiled)
     
     if len(logo_info) < 10:
         print("Manual method found few logos, trying automatic detection...")
-        logo_info = extractor.extract_logos(method="auto")
+        logo_info = extractor.extract_logos(method="auto", tiled=args.tiled)
     
     print(f"\nExtraction complete! {len(logo_info)} logos saved to '{extractor.output_dir}'")
     
@@ -0,0 +1,519 @@
+"""
+Logo Validation
+Shared color scheme, border and edge validation for extracted logo boxes, with a cached Validator
+"""
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from threadpoolctl import threadpool_limits
+from sklearn.cluster import KMeans
+import cv2
+from integral_image import IntegralImage
+from image_loader import SheetImage, load_sheet, DEFAULT_CACHE_DIR
+from color_quantization import quantize_colors, DEFAULT_BACKEND
+from crop_pipeline import crop_image, crop_view
+
+# Bump when the validation logic changes so cached results are not reused
+VALIDATION_VERSION = 4
+DEFAULT_VALIDATION_CACHE = os.path.join(DEFAULT_CACHE_DIR, "validation-cache.json")
+
+# Hue spread test used by detect_color_inconsistencies. kmeans is the
+# original test and stays the default, so extraction verdicts are unchanged;
+# circular is opt-in and flags more boxes (see --hue-method)
+HUE_METHODS = ("circular", "kmeans")
+DEFAULT_HUE_METHOD = "kmeans"
+
+def analyze_color_scheme(image_region, n_colors=5, backend=DEFAULT_BACKEND):
+    """
+    Analyze the color scheme of an image region to detect inconsistencies
+    Returns dominant colors and their percentages
+    """
+    # NumPy crops (e.g. views from crop_pipeline.crop_view) are read in place
+    if isinstance(image_region, np.ndarray):
+        img_array = image_region[:, :, :3]
+    else:
+        # Convert PIL to numpy array
+        img_array = np.array(image_region)
+    
+    # Ensure we have RGB format
+    if len(img_array.shape) != 3 or img_array.shape[2] != 3:
+        # Convert to RGB if needed
+        if image_region.mode != 'RGB':
+            image_region = image_region.convert('RGB')
+            img_array = np.array(image_region)
+    
+    # Reshape for clustering
+    pixels = img_array.reshape(-1, 3)
+    
+    # Remove white/near-white pixels (background)
+    non_white_mask = np.sum(pixels, axis=1) < 720  # RGB sum < 240*3
+    non_white_pixels = pixels[non_white_mask]
+    
+    if len(non_white_pixels) == 0:
+        return [], []
+    
+    # Perform k-means clustering
+    n_clusters = min(n_colors, len(non_white_pixels))
+    if n_clusters < 2:
+        return [], []
+        
+    # Quantize with the selected backend (kmeans, minibatch or mediancut)
+    centers, counts = quantize_colors(non_white_pixels, n_clusters, backend)
+    
+    # Get color percentages
+    total_pixels = len(non_white_pixels)
+    
+    colors = []
+    percentages = []
+    
+    for i, center in enumerate(centers):
+        percentage = (counts[i] / total_pixels) * 100
+        colors.append(center.astype(int))
+        percentages.append(percentage)
+    
+    return colors, percentages
+
+def circular_hue_spread(hues, period=180):
+    """
+    Width of the smallest hue arc containing every hue (OpenCV hue: 0-180)
+    
+    The arc is the circle minus its largest empty gap, so sorting the hues
+    and checking consecutive gaps (plus the wraparound gap) is exact in O(k log k).
+    """
+    hues = np.sort(np.asarray(hues, dtype=np.float64) % period)
+    gaps = np.diff(hues, append=hues[0] + period)
+    return float(period - gaps.max())
+
+def kmeans_hue_spread(hues):
+    """
+    Distance between the outermost of 3 KMeans hue clusters, with the
+    approximate wraparound correction (original method, kept for comparison)
+    """
+    hue_clusters = KMeans(n_clusters=min(3, len(hues)), random_state=42, n_init=10)
+    hue_clusters.fit(np.array(hues).reshape(-1, 1))
+    hue_centers = hue_clusters.cluster_centers_.flatten()
+    
+    max_hue_diff = max(hue_centers) - min(hue_centers)
+    # Account for hue wraparound (0-180 in OpenCV HSV)
+    if max_hue_diff > 90:  # Very different hues
+        max_hue_diff = min(max_hue_diff, 180 - max_hue_diff)
+    return max_hue_diff
+
+def palette_array(palettes, n_colors=8):
+    """
+    Stack per-box palettes into one (N, n_colors, 3) uint8 array
+    
+    Returns (array, counts): rows are zero-padded past each palette's length,
+    which counts holds.
+    """
+    array = np.zeros((len(palettes), n_colors, 3), dtype=np.uint8)
+    counts = np.zeros(len(palettes), dtype=np.intp)
+    for i, colors in enumerate(palettes):
+        if len(colors):
+            array[i, :len(colors)] = np.asarray(colors)
+            counts[i] = len(colors)
+    return array, counts
+
+def circular_hue_spreads(hues, counts, period=180):
+    """
+    Row-wise circular_hue_spread over an (N, k) hue array where only the
+    first counts[i] entries of row i are used
+    """
+    hues = np.asarray(hues, dtype=np.float64) % period
+    k = hues.shape[1]
+    valid = np.arange(k)[None, :] < counts[:, None]
+    
+    # Padding (beyond any real hue) sorts to the end of each row
+    hues = np.sort(np.where(valid, hues, 2 * period), axis=1)
+    gaps = np.diff(hues, axis=1)
+    gaps[~valid[:, 1:]] = -np.inf
+    
+    last = hues[np.arange(len(hues)), np.maximum(counts - 1, 0)]
+    wrap = hues[:, 0] + period - last
+    return period - np.maximum(gaps.max(axis=1, initial=-np.inf), wrap)
+
+def hue_inconsistencies(palettes, counts, hue_method=DEFAULT_HUE_METHOD):
+    """
+    Flag every palette whose hues spread over more than 60 (OpenCV hue units)
+    
+    Args:
+        palettes (np.ndarray): (N, k, 3) uint8 RGB palettes from palette_array
+        counts (np.ndarray): Number of real colors in each row
+        hue_method (str): "kmeans" (original hue clustering) or "circular"
+            (exact circular spread of the palette hues)
+    
+    Returns:
+        (N,) boolean array
+    """
+    if hue_method not in HUE_METHODS:
+        raise ValueError(f"Unknown hue method '{hue_method}', expected one of {HUE_METHODS}")
+    
+    # Convert colors to HSV for better comparison; the whole batch is one image
+    hsv = cv2.cvtColor(palettes, cv2.COLOR_RGB2HSV)
+    hues = hsv[:, :, 0]
+    
+    # If colors are spread across very different hue ranges, might be encroachment
+    if hue_method == "circular":
+        spreads = circular_hue_spreads(hues, counts)
+    else:
+        spreads = np.array([kmeans_hue_spread(h[:n]) if n >= 2 else 0.0
+                            for h, n in zip(hues, counts)])
+    
+    return (counts >= 2) & (spreads > 60)  # Significantly different color schemes
+
+def detect_color_inconsistencies(image_region, threshold=15, backend=DEFAULT_BACKEND,
+                                 hue_method=DEFAULT_HUE_METHOD):
+    """
+    Detect if there are color inconsistencies that suggest encroachment
+    Returns True if potential encroachment detected
+    
+    hue_method: "kmeans" (original hue clustering) or "circular" (exact
+    circular spread of the palette hues)
+    """
+    colors, percentages = analyze_color_scheme(image_region, n_colors=8, backend=backend)
+    
+    if len(colors) < 2:
+        return False
+    
+    palettes, counts = palette_array([colors])
+    return bool(hue_inconsistencies(palettes, counts, hue_method)[0])
+
+def validate_logo_boundaries(image, x, y, width, height, company_name, luma_table=None,
+                             color_backend=DEFAULT_BACKEND, hue_method=DEFAULT_HUE_METHOD,
+                             has_inconsistencies=None, region=None):
+    """
+    Validate logo boundaries using multiple methods
+    
+    has_inconsistencies and region may be passed in when the color check
+    and crop were already done for a batch of boxes (see validate_boxes).
+    """
+    # Extract the region
+    if region is None:
+        region = image.crop((x, y, x + width, y + height))
+    
+    # Method 1: Color scheme analysis
+    if has_inconsistencies is None:
+        has_inconsistencies = detect_color_inconsistencies(region, backend=color_backend,
+                                                           hue_method=hue_method)
+    
+    # Method 2: Edge detection to find natural boundaries
+    region_array = np.array(region.convert('L'))  # Convert to grayscale
+    edges = cv2.Canny(region_array, 50, 150)
+    
+    # Find contours
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    # Method 3: Check for content near borders
+    border_threshold = 10  # pixels from edge
+    
+    # Check if there's significant content near borders
+    # (O(1) per strip when a sheet-wide integral image of the luminance is supplied)
+    if luma_table is None:
+        luma_table = IntegralImage(region_array)
+        x0, y0 = 0, 0
+    else:
+        x0, y0 = x, y
+    border_means = luma_table.border_means(x0, y0, width, height, border_threshold)
+    
+    border_content = sum(mean < 240 for mean in border_means)
+    
+    # Validation results
+    validation_results = {
+        'company': company_name,
+        'coordinates': (x, y, width, height),
+        'color_inconsistencies': has_inconsistencies,
+        'border_content_count': border_content,
+        'needs_adjustment': has_inconsistencies or border_content > 2,
+        'contour_count': len(contours)
+    }
+    
+    return validation_results
+
+def validate_boxes(sheet, boxes, luma_table=None, color_backend=DEFAULT_BACKEND,
+                   hue_method=DEFAULT_HUE_METHOD):
+    """
+    Validate a list of (x, y, width, height, company_name) boxes on a SheetImage
+    
+    Each box is cropped once, as a view of the sheet buffer. Palettes for
+    every box are stacked into one (N, k, 3) array, so the HSV conversion
+    and hue test run once for the batch instead of once per color.
+    """
+    if not boxes:
+        return []
+    
+    regions = []
+    palettes = []
+    for x, y, width, height, _ in boxes:
+        region = crop_image(sheet, x, y, width, height)
+        view = crop_view(sheet, x, y, width, height)
+        colors, _ = analyze_color_scheme(region if view is None else view, n_colors=8,
+                                         backend=color_backend)
+        regions.append(region)
+        palettes.append(colors)
+    
+    palettes, counts = palette_array(palettes)
+    flags = hue_inconsistencies(palettes, counts, hue_method)
+    
+    return [validate_logo_boundaries(sheet.pil, *box, luma_table=luma_table,
+                                     has_inconsistencies=bool(flag), region=region)
+            for box, flag, region in zip(boxes, flags, regions)]
+
+def create_html_preview(image, logo_coords, validation_results, output_file="logo_validation.html",
+                        title="Logo Extraction Validation", image_src="client-logos-collection.png",
+                        image_alt="Logo Collection", border_width=2, fill_opacity=0.1):
+    """
+    Create an HTML file with interactive preview using Puppeteer-like visualization
+    """
+    html_content = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; }}
+        .container {{ position: relative; display: inline-block; }}
+        .logo-box {{ position: absolute; border: {border_width}px solid; cursor: pointer; }}
+        .valid {{ border-color: green; background: rgba(0,255,0,{fill_opacity}); }}
+        .invalid {{ border-color: red; background: rgba(255,0,0,{fill_opacity}); }}
+        .warning {{ border-color: orange; background: rgba(255,165,0,{fill_opacity}); }}
+        .info {{ margin: 20px 0; }}
+        .legend {{ margin: 10px 0; }}
+        .legend span {{ display: inline-block; width: 20px; height: 20px; margin-right: 5px; }}
+        table {{ border-collapse: collapse; margin-top: 20px; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; }}
+        .needs-adjustment {{ background-color: #ffebee; }}
+    </style>
+</head>
+<body>
+    <h1>{title} Results</h1>
+    <div class="info">
+        <div class="legend">
+            <span style="background-color: rgba(0,255,0,0.3); border: {border_width}px solid green;"></span> Valid extraction
+            <span style="background-color: rgba(255,165,0,0.3); border: {border_width}px solid orange;"></span> Needs review
+            <span style="background-color: rgba(255,0,0,0.3); border: {border_width}px solid red;"></span> Likely encroachment
+        </div>
+    </div>
+    
+    <div class="container">
+        <img src="{image_src}" alt="{image_alt}" style="max-width: 100%;">
+"""
+    
+    # Add logo boxes
+    for i, (coord, validation) in enumerate(zip(logo_coords, validation_results)):
+        x, y, width, height = coord['x'], coord['y'], coord['width'], coord['height']
+        
+        if validation['needs_adjustment']:
+            if validation['color_inconsistencies']:
+                css_class = "invalid"
+                title = f"⚠️ Color inconsistencies detected"
+            else:
+                css_class = "warning"
+                title = f"⚠️ Content near borders"
+        else:
+            css_class = "valid"
+            title = f"✅ Looks good"
+        
+        html_content += f'''
+        <div class="logo-box {css_class}" 
+             style="left: {x}px; top: {y}px; width: {width}px; height: {height}px;"
+             title="{title}: {coord['name']}">
+        </div>'''
+    
+    html_content += """
+    </div>
+    
+    <table>
+        <tr>
+            <th>Company</th>
+            <th>Coordinates</th>
+            <th>Color Issues</th>
+            <th>Border Content</th>
+            <th>Status</th>
+            <th>Recommendation</th>
+        </tr>
+"""
+    
+    # Add validation table
+    for validation in validation_results:
+        row_class = "needs-adjustment" if validation['needs_adjustment'] else ""
+        status = "❌ Needs adjustment" if validation['needs_adjustment'] else "✅ Valid"
+        
+        recommendation = ""
+        if validation['color_inconsistencies']:
+            recommendation = "Reduce extraction area - color scheme inconsistencies detected"
+        elif validation['border_content_count'] > 2:
+            recommendation = "Expand extraction area - content too close to borders"
+        else:
+            recommendation = "Extraction looks good"
+        
+        html_content += f"""
+        <tr class="{row_class}">
+            <td>{validation['company']}</td>
+            <td>{validation['coordinates']}</td>
+            <td>{'Yes' if validation['color_inconsistencies'] else 'No'}</td>
+            <td>{validation['border_content_count']}/4 borders</td>
+            <td>{status}</td>
+            <td>{recommendation}</td>
+        </tr>"""
+    
+    html_content += """
+    </table>
+</body>
+</html>"""
+    
+    with open(output_file, 'w') as f:
+        f.write(html_content)
+    
+    return output_file
+
+class Validator:
+    """
+    Validates logo boxes on one sheet, caching results per crop
+
+    Results are keyed by the sheet's content hash, the box coordinates and the
+    color backend, and persisted to cache_file, so a coordinate-tuning loop
+    only re-validates the boxes whose coordinates (or source sheet) changed.
+    """
+
+    def __init__(self, image, color_backend=DEFAULT_BACKEND, hue_method=DEFAULT_HUE_METHOD,
+                 cache_file=DEFAULT_VALIDATION_CACHE):
+        self.sheet = load_sheet(image)
+        self.image = self.sheet.pil
+        self.color_backend = color_backend
+        self.hue_method = hue_method
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+
+        self._luma_table = None
+        self._cache = {}
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file) as f:
+                    self._cache = json.load(f)
+            except (ValueError, OSError):
+                self._cache = {}
+
+    @property
+    def luma_table(self):
+        """Integral image of the sheet's luminance, built on first use"""
+        if self._luma_table is None:
+            self._luma_table = IntegralImage(self.sheet.luma)
+        return self._luma_table
+
+    def cache_key(self, x, y, width, height):
+        return (f"v{VALIDATION_VERSION}:{self.sheet.content_hash}:{self.color_backend}:"
+                f"{self.hue_method}:{x},{y},{width},{height}")
+
+    def validate(self, x, y, width, height, company_name):
+        """
+        Validate one box, reusing a cached result when the crop is unchanged
+        """
+        return self.validate_all([{"name": company_name, "x": x, "y": y,
+                                   "width": width, "height": height}])[0]
+
+    def validate_all(self, logo_coords, workers=1):
+        """
+        Validate a list of {"name", "x", "y", "width", "height"} boxes
+
+        With workers > 1, boxes missing from the cache are fanned out over a
+        process pool that reads the sheet from shared memory. Results come
+        back in input order and are identical to the serial path.
+        """
+        results = [None] * len(logo_coords)
+        pending = []
+        for i, c in enumerate(logo_coords):
+            cached = self._cache.get(self.cache_key(c['x'], c['y'], c['width'], c['height']))
+            if cached is not None:
+                self.hits += 1
+                results[i] = dict(cached)
+            else:
+                pending.append(i)
+
+        boxes = [(logo_coords[i]['x'], logo_coords[i]['y'], logo_coords[i]['width'],
+                  logo_coords[i]['height'], logo_coords[i]['name']) for i in pending]
+        if workers > 1 and len(boxes) > 1:
+            computed = self._validate_parallel(boxes, workers)
+        else:
+            computed = validate_boxes(self.sheet, boxes, luma_table=self.luma_table,
+                                      color_backend=self.color_backend, hue_method=self.hue_method)
+
+        self.misses += len(pending)
+        for i, result in zip(pending, computed):
+            c = logo_coords[i]
+            key = self.cache_key(c['x'], c['y'], c['width'], c['height'])
+            self._cache[key] = {k: v for k, v in result.items() if k not in ('company', 'coordinates')}
+            results[i] = result
+
+        for c, result in zip(logo_coords, results):
+            result['company'] = c['name']
+            result['coordinates'] = (c['x'], c['y'], c['width'], c['height'])
+        return results
+
+    def _validate_parallel(self, boxes, workers):
+        """
+        Validate boxes in worker processes that map the sheet from shared memory
+        """
+        pixels = self.sheet.pixels
+        shm = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+        try:
+            shared = np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=shm.buf)
+            shared[:] = pixels
+            del shared
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, pixels.shape, self.color_backend,
+                                               self.hue_method)) as pool:
+                # One contiguous batch per worker; map() yields in submission
+                # order, so output order is deterministic
+                size = -(-len(boxes) // workers)
+                batches = [boxes[i:i + size] for i in range(0, len(boxes), size)]
+                return [result for batch in pool.map(_validate_in_worker, batches)
+                        for result in batch]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def save(self):
+        """
+        Persist the result cache
+        
+        Entries from older VALIDATION_VERSIONs are dropped. Entries for other
+        sheets are kept: the advanced and spaced extractors share this file.
+        """
+        if not self.cache_file:
+            return
+        prefix = f"v{VALIDATION_VERSION}:"
+        self._cache = {key: value for key, value in self._cache.items() if key.startswith(prefix)}
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+
+# Per-process state for parallel validation
+_worker = {}
+
+
+def _init_worker(shm_name, shape, color_backend, hue_method):
+    """
+    Attach to the shared sheet once per worker process
+    """
+    # One thread per process: parallelism comes from the pool, not from BLAS/OpenMP
+    threadpool_limits(1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    sheet = SheetImage(pixels)
+    _worker.update(shm=shm, sheet=sheet, luma_table=IntegralImage(sheet.luma),
+                   color_backend=color_backend, hue_method=hue_method)
+
+
+def _validate_in_worker(boxes):
+    return validate_boxes(_worker['sheet'], boxes, luma_table=_worker['luma_table'],
+                          color_backend=_worker['color_backend'],
+                          hue_method=_worker['hue_method'])
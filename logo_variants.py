@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Logo Size Variants
+Writes 1x/2x/3x resized copies of each logo matched to the layouts' display boxes, for srcset/sizes
+"""
+
+import re
+import argparse
+from pathlib import Path
+
+from PIL import Image
+
+# CSS max-width/max-height of the logo <img> in each layout (implement_layout_choice.py)
+DISPLAY_BOXES = {
+    "ticker": {"default": (150, 50), "mobile": (120, 40)},
+    "sector": {"default": (120, 35)},
+    "spotlight": {"default": (120, 50)},
+    "spotlight-regular": {"default": (100, 40)},
+}
+MOBILE_QUERY = "(max-width: 768px)"
+DENSITIES = (1, 2, 3)
+VARIANT_DIR = "sized"
+
+
+def display_width(natural_size, box):
+    """
+    Rendered CSS width of an image under max-width/max-height with width: auto
+
+    Images are only ever scaled down, so small logos keep their natural size.
+    """
+    width, height = natural_size
+    max_width, max_height = box
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, round(width * scale))
+
+
+def variant_widths(natural_size, layouts=DISPLAY_BOXES, merge_within=0.1):
+    """
+    Pixel widths worth generating for one logo: every layout box at every
+    density, capped at the natural width (never upscaled)
+    
+    Widths within merge_within of a larger one are served by it, which keeps
+    the file count down for at most ~10% extra pixels.
+    """
+    wanted = set()
+    for boxes in layouts.values():
+        for box in boxes.values():
+            css_width = display_width(natural_size, box)
+            wanted.update(min(natural_size[0], css_width * d) for d in DENSITIES)
+    
+    widths = []
+    for width in sorted(wanted, reverse=True):
+        if not widths or width < widths[-1] * (1 - merge_within):
+            widths.append(width)
+    return sorted(widths)
+
+
+def variant_path(png_path, width, ext="png"):
+    """
+    logos/logo-nasa.png -> logos/sized/logo-nasa-150w.png
+    """
+    png_path = Path(png_path)
+    return png_path.parent / VARIANT_DIR / f"{png_path.stem}-{width}w.{ext}"
+
+
+def existing_variants(png_path, ext="png"):
+    """
+    [(width, path)] of the size variants on disk for a logo, narrowest first
+    """
+    png_path = Path(png_path)
+    pattern = re.compile(rf"^{re.escape(png_path.stem)}-(\d+)w\.{ext}$")
+    variant_dir = png_path.parent / VARIANT_DIR
+    if not variant_dir.is_dir():
+        return []
+    found = []
+    for path in variant_dir.iterdir():
+        match = pattern.match(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def srcset_attribute(png_path, ext="png"):
+    """
+    srcset value ("url 75w, url 150w, ...") listing a logo's size variants, or None
+    """
+    variants = existing_variants(png_path, ext)
+    if not variants:
+        return None
+    return ", ".join(f"{path.as_posix()} {width}w" for width, path in variants)
+
+
+def sizes_attribute(png_path, layout):
+    """
+    sizes value giving the logo's rendered width in a layout's display box(es)
+    """
+    with Image.open(png_path) as img:
+        natural_size = img.size
+    boxes = DISPLAY_BOXES[layout]
+    default = f"{display_width(natural_size, boxes['default'])}px"
+    if "mobile" in boxes:
+        return f"{MOBILE_QUERY} {display_width(natural_size, boxes['mobile'])}px, {default}"
+    return default
+
+
+def generate_variants(directory="logos", force=False):
+    """
+    Write the size variants of every PNG in a directory to <directory>/sized/
+
+    Variants are only rewritten when their PNG is newer (or with force), and
+    stale widths left over from an earlier, differently sized PNG are removed.
+
+    Returns {png name: [widths]}.
+    """
+    directory = Path(directory)
+    (directory / VARIANT_DIR).mkdir(exist_ok=True)
+    report = {}
+
+    for png_path in sorted(directory.glob("*.png")):
+        png_mtime = png_path.stat().st_mtime_ns
+        with Image.open(png_path) as img:
+            widths = variant_widths(img.size)
+            # Palette PNGs (e.g. from png_encoding's max profile) would resize with nearest neighbour
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+
+            for width in widths:
+                out_path = variant_path(png_path, width)
+                if not force and out_path.exists() and out_path.stat().st_mtime_ns >= png_mtime:
+                    continue
+                height = max(1, round(img.height * width / img.width))
+                # Pillow resamples RGBA with premultiplied alpha, so edges stay clean
+                img.resize((width, height), Image.Resampling.LANCZOS).save(out_path, "PNG")
+
+        # Derivatives (AVIF/WebP) of removed widths go too
+        for width, path in existing_variants(png_path):
+            if width not in widths:
+                for stale in path.parent.glob(f"{path.stem}.*"):
+                    stale.unlink()
+
+        report[png_path.name] = widths
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate 1x/2x/3x logo size variants for srcset")
+    parser.add_argument("directory", nargs="?", default="logos", help="Folder of PNGs (default: logos)")
+    parser.add_argument("--force", action="store_true", help="Re-render even if variants are up to date")
+    args = parser.parse_args()
+
+    print(f"📐 Generating size variants in {args.directory}/{VARIANT_DIR}/")
+    report = generate_variants(args.directory, args.force)
+    for name, widths in report.items():
+        print(f"  {name}: {', '.join(f'{w}w' for w in widths)}")
+    print(f"✅ {sum(len(w) for w in report.values())} variants for {len(report)} logos")
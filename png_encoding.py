@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+PNG Encode Profiles
+Fast encodes for iterative tuning runs, maximum compression and palette PNGs for publishing to logos/
+"""
+
+import io
+import os
+import argparse
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Pillow save() options per profile; "palette" is the only lossy one
+ENCODE_PROFILES = {
+    "default": {},                              # Pillow defaults (zlib level 6), what the scripts always used
+    "fast": {"compress_level": 1},              # Quick iterations while tuning coordinates
+    "max": {"optimize": True},                  # zlib level 9 + best filter, lossless palette when possible
+    "palette": {"optimize": True},              # 256-color quantized, for publishing
+}
+DEFAULT_PROFILE = "default"
+LOSSLESS_PROFILES = ("default", "fast", "max")
+
+
+def lossless_palette(image):
+    """
+    Convert an RGB(A) image with at most 256 distinct colors to an exact 'P'
+    image (alpha goes into the tRNS chunk); other images are returned as-is
+    """
+    if image.mode not in ('RGB', 'RGBA') or image.getcolors(256) is None:
+        return image
+
+    pixels = np.asarray(image)
+    channels = pixels.shape[2]
+    colors, index = np.unique(pixels.reshape(-1, channels), axis=0, return_inverse=True)
+
+    palette_image = Image.fromarray(index.reshape(pixels.shape[:2]).astype(np.uint8), 'P')
+    palette_image.putpalette(colors[:, :3].tobytes())
+    if channels == 4:
+        palette_image.info['transparency'] = colors[:, 3].tobytes()
+    return palette_image
+
+
+def prepare_for_profile(image, profile):
+    """
+    Apply the profile's pixel transform (palette conversion) before saving
+    """
+    if profile == "max":
+        return lossless_palette(image)
+    if profile == "palette":
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        # Fast octree is the quantizer Pillow supports for RGBA
+        return image.quantize(colors=256, method=Image.Quantize.FASTOCTREE,
+                              dither=Image.Dither.NONE)
+    return image
+
+
+def _save_options(image, profile, icc_profile):
+    """
+    Pillow save() options for a profile, with the ICC profile to embed
+
+    Palette conversion builds a new image without the source's info, so the
+    profile is passed explicitly rather than left to image.info.
+    """
+    options = dict(ENCODE_PROFILES[profile])
+    if icc_profile is None:
+        icc_profile = image.info.get('icc_profile')
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    return options
+
+
+def encode_png(image, profile=DEFAULT_PROFILE, icc_profile=None):
+    """
+    Encode an image to PNG bytes with the given profile
+
+    icc_profile defaults to the one in image.info, if any.
+    """
+    if profile not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown PNG profile '{profile}', expected one of {tuple(ENCODE_PROFILES)}")
+
+    buffer = io.BytesIO()
+    options = _save_options(image, profile, icc_profile)
+    prepare_for_profile(image, profile).save(buffer, "PNG", **options)
+    return buffer.getvalue()
+
+
+def save_png(image, output_path, profile=DEFAULT_PROFILE, compare=False, icc_profile=None):
+    """
+    Save an image as PNG with the given profile
+
+    icc_profile (e.g. the source sheet's) is embedded in the output; it
+    defaults to the one in image.info. Returns (bytes_written, default_bytes).
+    With compare=True the image is also encoded with the default profile in
+    memory so callers can report the bytes saved; otherwise default_bytes is None.
+    """
+    if profile == DEFAULT_PROFILE:
+        # Same call as the original image.crop(...).save(...), color profile included
+        image.save(output_path, "PNG", **_save_options(image, profile, icc_profile))
+        size = os.path.getsize(output_path)
+        return size, size if compare else None
+
+    data = encode_png(image, profile, icc_profile)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    default_bytes = len(encode_png(image, DEFAULT_PROFILE, icc_profile)) if compare else None
+    return len(data), default_bytes
+
+
+def print_savings(results):
+    """
+    Print bytes saved per logo from (name, bytes_written, default_bytes) rows
+    """
+    total_written = total_default = 0
+    for name, written, default in results:
+        if default is None:
+            continue
+        saved = default - written
+        percent = 100 * saved / default if default else 0.0
+        print(f"  {name}: {default:,} → {written:,} bytes ({saved:+,} saved, {percent:.1f}%)")
+        total_written += written
+        total_default += default
+
+    if total_default:
+        saved = total_default - total_written
+        print(f"  Total: {total_default:,} → {total_written:,} bytes "
+              f"({saved:+,} saved, {100 * saved / total_default:.1f}%)")
+
+
+def recompress_directory(directory, profile="max", output_dir=None):
+    """
+    Re-encode every PNG in a directory (e.g. logos/) and report bytes saved
+
+    Files are rewritten in place only for lossless profiles and only when the
+    result is smaller; the lossy "palette" profile needs a separate output_dir.
+    """
+    directory = Path(directory)
+    if output_dir is None and profile not in LOSSLESS_PROFILES:
+        raise ValueError(f"Profile '{profile}' is lossy; pass an output directory")
+    output_dir = Path(output_dir) if output_dir else directory
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for path in sorted(directory.glob("*.png")):
+        original = path.stat().st_size
+        with Image.open(path) as img:
+            img.load()
+            data = encode_png(img, profile)
+
+        target = output_dir / path.name
+        if len(data) < original or target != path:
+            with open(target, 'wb') as f:
+                f.write(data if len(data) < original else path.read_bytes())
+        results.append((path.name, min(len(data), original), original))
+
+    print(f"Re-encoded {len(results)} PNGs from {directory} with the '{profile}' profile:")
+    print_savings(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode logo PNGs with a publishing profile")
+    parser.add_argument("directory", nargs="?", default="logos", help="Folder of PNGs (default: logos)")
+    parser.add_argument("--profile", default="max", choices=tuple(ENCODE_PROFILES),
+                        help="Encode profile (default: max, lossless)")
+    parser.add_argument("--output", help="Write here instead of in place (required for 'palette')")
+    args = parser.parse_args()
+    if args.output is None and args.profile not in LOSSLESS_PROFILES:
+        parser.error(f"--profile {args.profile} is lossy; pass --output to keep the originals")
+
+    recompress_directory(args.directory, args.profile, args.output)
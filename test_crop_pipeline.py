@@ -0,0 +1,48 @@
+"""
+Crop Pipeline Tests
+Crops written through CropWriter keep the source sheet's embedded ICC profile
+"""
+
+import pytest
+from PIL import Image
+
+from crop_pipeline import CropWriter, crop_image
+from image_loader import SheetImage
+from png_encoding import ENCODE_PROFILES
+
+SHEET_PATH = "client-logos-collection.png"
+
+
+@pytest.fixture(scope="module")
+def sheet():
+    sheet = SheetImage.open(SHEET_PATH)
+    assert sheet.icc_profile, "the bundled sheet is expected to carry an ICC profile"
+    return sheet
+
+
+@pytest.mark.parametrize("profile", tuple(ENCODE_PROFILES))
+def test_crop_writer_keeps_icc_profile(sheet, tmp_path, profile):
+    boxes = [(10, 20, 120, 80), (0, 0, 50, 50), (sheet.width - 60, sheet.height - 40, 60, 40)]
+    outputs = [tmp_path / f"logo-{i}.png" for i in range(len(boxes))]
+    with CropWriter(sheet, profile=profile) as writer:
+        for box, out in zip(boxes, outputs):
+            writer.submit(*box, str(out))
+
+    for out in outputs:
+        with Image.open(out) as saved:
+            assert saved.info.get('icc_profile') == sheet.icc_profile
+
+
+def test_crop_matches_pil_crop(sheet, tmp_path):
+    box = (sheet.width - 60, sheet.height - 40, 60, 40)
+    out = tmp_path / "logo.png"
+    with CropWriter(sheet) as writer:
+        writer.submit(*box, str(out))
+
+    x, y, w, h = box
+    with Image.open(SHEET_PATH) as original:
+        expected = original.crop((x, y, x + w, y + h))
+        with Image.open(out) as saved:
+            assert saved.tobytes() == expected.tobytes()
+            assert saved.info.get('icc_profile') == expected.info.get('icc_profile')
+    assert crop_image(sheet, *box).info.get('icc_profile') == sheet.icc_profile
@@ -0,0 +1,167 @@
+"""
+Tiled Detection
+Finds external contours on very large sheets strip by strip, with bounded memory
+
+The binary mask is rebuilt one horizontal strip at a time from overlapping source
+rows (the halo), so filters see the same neighbourhood as on the full image.
+Components that cross a strip seam are joined with a union-find over the seam
+rows and re-traced from a crop of their merged bounding box. The result is the
+same list of contours that cv2.findContours(full_mask, RETR_EXTERNAL,
+CHAIN_APPROX_SIMPLE) returns, in the same order.
+"""
+
+import cv2
+import numpy as np
+
+
+def strip_mask_builder(gray_rows, height, build_mask, halo):
+    """
+    Wrap a full-image mask pipeline so it can be evaluated for a band of rows
+
+    Args:
+        gray_rows (callable): gray_rows(y0, y1) -> grayscale rows [y0, y1)
+        height (int): Image height
+        build_mask (callable): Pipeline from a grayscale block to a binary mask
+        halo (int): Extra rows read above and below; must cover the pipeline's
+            vertical footprint (blur + threshold + morphology radii)
+
+    Returns:
+        mask_rows(y0, y1) giving rows [y0, y1) of the full-image mask
+    """
+    def mask_rows(y0, y1):
+        a = max(0, y0 - halo)
+        b = min(height, y1 + halo)
+        return build_mask(gray_rows(a, b))[y0 - a:y1 - a]
+
+    return mask_rows
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        self.parent.setdefault(key, key)
+        root = key
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[key] != root:
+            self.parent[key], key = root, self.parent[key]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def _seam_pairs(upper_row, lower_row):
+    """
+    Label pairs that touch across a seam (8-connectivity)
+    """
+    pairs = set()
+    width = len(upper_row)
+    for dc in (-1, 0, 1):
+        lo = max(0, -dc)
+        hi = width - max(0, dc)
+        up = upper_row[lo + dc:hi + dc]
+        low = lower_row[lo:hi]
+        both = (up > 0) & (low > 0)
+        pairs.update(zip(up[both].tolist(), low[both].tolist()))
+    return pairs
+
+
+def _trace_component(mask_rows, bbox):
+    """
+    Re-trace one seam-crossing component from a crop of its bounding box
+    """
+    x, y, w, h = bbox
+    crop = mask_rows(y, y + h)[:, x:x + w]
+    # Zero border so pixels on the crop edge trace as they do inside the full image
+    crop = cv2.copyMakeBorder(crop, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    contours, _ = cv2.findContours(crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # The component is the contour spanning the whole crop; neighbours are cut off
+    matches = [c for c in contours if cv2.boundingRect(c) == (1, 1, w, h)]
+    contour = max(matches, key=cv2.contourArea)
+    return contour + np.array([x - 1, y - 1], dtype=contour.dtype)
+
+
+def find_external_contours(mask_rows, height, strip_height=1024):
+    """
+    Tiled equivalent of cv2.findContours(mask, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)
+
+    Args:
+        mask_rows (callable): mask_rows(y0, y1) -> uint8 mask rows [y0, y1),
+            typically from strip_mask_builder
+        height (int): Full mask height
+        strip_height (int): Rows per strip; peak memory scales with this
+
+    Returns:
+        List of contours in full-image coordinates
+    """
+    seams = _UnionFind()
+    piece_boxes = {}  # (strip, label) -> (x0, y0, x1, y1)
+    strip_contours = []  # (strip, label, contour)
+    prev_bottom = None
+
+    for strip, y0 in enumerate(range(0, height, strip_height)):
+        y1 = min(height, y0 + strip_height)
+        mask = mask_rows(y0, y1)
+
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        for label in range(1, count):
+            sx, sy, sw, sh = stats[label, :4]
+            piece_boxes[(strip, label)] = (int(sx), int(sy) + y0, int(sx + sw), int(sy + sh) + y0)
+            seams.find((strip, label))
+
+        if prev_bottom is not None:
+            for upper, lower in _seam_pairs(prev_bottom, labels[0]):
+                seams.union((strip - 1, upper), (strip, lower))
+        prev_bottom = labels[-1].copy()
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            cx, cy = contour[0][0]
+            strip_contours.append((strip, int(labels[cy, cx]), contour + np.array([0, y0], dtype=contour.dtype)))
+
+        del mask, labels
+
+    # Merge the bounding boxes of pieces that belong to the same component
+    groups = {}
+    for key, box in piece_boxes.items():
+        root = seams.find(key)
+        if root in groups:
+            gx0, gy0, gx1, gy1 = groups[root][0]
+            groups[root] = ((min(gx0, box[0]), min(gy0, box[1]), max(gx1, box[2]), max(gy1, box[3])),
+                            groups[root][1] + 1)
+        else:
+            groups[root] = (box, 1)
+
+    # Components that never touch a seam keep the contour traced in their strip
+    results = [contour for strip, label, contour in strip_contours
+               if groups[seams.find((strip, label))][1] == 1]
+
+    # Each crossing component is traced once, from the crop of its merged box
+    crossing = [_trace_component(mask_rows, (gx0, gy0, gx1 - gx0, gy1 - gy0))
+                for (gx0, gy0, gx1, gy1), pieces in groups.values() if pieces > 1]
+
+    # Components sitting in a hole that only closes across a seam looked external
+    # within their strip; the full image would not report them
+    def is_nested(contour):
+        px, py = (float(v) for v in contour[0][0])
+        x, y, w, h = cv2.boundingRect(contour)
+        for outer in crossing:
+            if outer is contour:
+                continue
+            ox, oy, ow, oh = cv2.boundingRect(outer)
+            if ox <= x and oy <= y and x + w <= ox + ow and y + h <= oy + oh:
+                if cv2.pointPolygonTest(outer, (px, py), False) > 0:
+                    return True
+        return False
+
+    results = [c for c in results + crossing if not is_nested(c)]
+
+    # findContours reports contours in reverse raster order of their start points
+    results.sort(key=lambda c: (int(c[0][0][1]), int(c[0][0][0])), reverse=True)
+    return results